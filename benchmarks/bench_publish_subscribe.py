@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Throughput and latency of the publish/subscribe providers.
+
+Publishes a burst of messages to publish_subscribe.Provider and/or
+publish_subscribe_pro.Provider, drains it with update() and prints one
+JSON document per provider:
+    msgs_per_sec         published messages delivered per second
+    deliveries_per_sec   Subscriber.run() calls per second
+    latency_us           publish -> run() latency percentiles
+    dispatch_us          time between two run() calls percentiles
+    peak_memory_bytes    tracemalloc peak of a separate, identical run
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_publish_subscribe.py --topics 100 --fanout 4
+"""
+
+import argparse
+import json
+import sys
+import tracemalloc
+from time import perf_counter
+
+from patterns.behavioral import publish_subscribe, publish_subscribe_pro
+
+
+class BenchSubscriber(object):
+    """Records when it is run and spends ``cost`` seconds per message."""
+
+    def __init__(self, deliveries, cost):
+        self.deliveries = deliveries
+        self.cost = cost
+
+    def run(self, msg):
+        now = perf_counter()
+        self.deliveries.append(now)
+        if self.cost:
+            deadline = now + self.cost
+            while perf_counter() < deadline:
+                pass
+
+
+def _basic(topics, deliveries, args):
+    provider = publish_subscribe.Provider()
+    # messages are topic names here, so the size goes into the name
+    names = ['topic.{}.'.format(i) for i in range(topics)]
+    names = [name + 'x' * (args.size - len(name)) for name in names]
+    subscribers = []
+    for name in names:
+        for _ in range(args.fanout):
+            sub = BenchSubscriber(deliveries, args.cost)
+            subscribers.append(sub)
+            provider.subscribe(name, sub)
+    return provider, subscribers, lambda i: provider.notify(names[i % topics])
+
+
+def _pro(topics, deliveries, args):
+    provider = publish_subscribe_pro.Provider()
+    names = ['publisher {}'.format(i) for i in range(topics)]
+    payload = b'x' * args.size
+    subscribers = []
+    for name in names:
+        for _ in range(args.fanout):
+            sub = BenchSubscriber(deliveries, args.cost)
+            subscribers.append(sub)
+            provider.subscribe(name, sub)
+    return provider, subscribers, lambda i: provider.notify(names[i % topics], payload)
+
+
+PROVIDERS = {'publish_subscribe': _basic, 'publish_subscribe_pro': _pro}
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1e6
+    return {'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'p999': pick(0.999), 'max': values[-1] * 1e6}
+
+
+def _run(setup, args):
+    deliveries = []
+    provider, subscribers, publish = setup(args.topics, deliveries, args)
+    published = [0.0] * args.messages
+    started = perf_counter()
+    for i in range(args.messages):
+        published[i] = perf_counter()
+        publish(i)
+    provider.update()
+    elapsed = perf_counter() - started
+    return elapsed, published, deliveries
+
+
+def bench(name, args):
+    setup = PROVIDERS[name]
+    elapsed, published, deliveries = min((_run(setup, args) for _ in range(args.repeat)), key=lambda r: r[0])
+    # every message is delivered to exactly ``fanout`` subscribers, in order
+    latency = [at - published[k // args.fanout] for k, at in enumerate(deliveries)]
+    dispatch = [b - a for a, b in zip(deliveries, deliveries[1:])]
+
+    tracemalloc.start()
+    _run(setup, args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'provider': name,
+        'params': {
+            'topics': args.topics,
+            'fanout': args.fanout,
+            'messages': args.messages,
+            'size': args.size,
+            'cost_us': args.cost * 1e6,
+            'repeat': args.repeat,
+        },
+        'python': sys.version.split()[0],
+        'elapsed_s': elapsed,
+        'msgs_per_sec': args.messages / elapsed,
+        'deliveries_per_sec': len(deliveries) / elapsed,
+        'latency_us': _percentiles(latency),
+        'dispatch_us': _percentiles(dispatch),
+        'peak_memory_bytes': peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--provider', choices=sorted(PROVIDERS) + ['all'], default='all')
+    parser.add_argument('--topics', type=int, default=100, help='topics (publishers for the pro provider)')
+    parser.add_argument('--fanout', type=int, default=4, help='subscribers per topic')
+    parser.add_argument('--messages', type=int, default=100000, help='messages published per run')
+    parser.add_argument('--size', type=int, default=16, help='message size in bytes')
+    parser.add_argument('--cost', type=float, default=0.0, help='busy time per delivery in microseconds')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs, the fastest one is reported')
+    args = parser.parse_args(argv)
+    args.cost /= 1e6
+
+    names = sorted(PROVIDERS) if args.provider == 'all' else [args.provider]
+    for name in names:
+        print(json.dumps(bench(name, args), sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Memory allocated by update() of the publish/subscribe providers.
+
+Queues the messages first, then traces only the update() call that
+delivers them and prints one JSON line per provider with
+    peak_bytes       tracemalloc peak above the memory in use before
+    retained_bytes   memory in use afterwards above the memory before
+    retained_blocks  memory blocks allocated by update() still alive
+Every subscriber of one publisher subscribes another one while it is
+being delivered to, so the subscriber collections change during dispatch.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_publish_subscribe_alloc.py --messages 100000
+"""
+
+import argparse
+import json
+import sys
+import tracemalloc
+
+from patterns.behavioral import publish_subscribe, publish_subscribe_pro
+
+
+class Sink(object):
+    def run(self, msg):
+        pass
+
+
+class Joiner(object):
+    """Subscribes a new Sink to its topic the first time it is run."""
+
+    def __init__(self, provider, topic, keep):
+        self.provider = provider
+        self.topic = topic
+        self.keep = keep
+
+    def run(self, msg):
+        if self.keep is not None:
+            sink = Sink()
+            self.keep.append(sink)
+            self.provider.subscribe(self.topic, sink)
+            self.keep = None
+
+
+def _basic(args, keep):
+    provider = publish_subscribe.Provider()
+    for topic in range(args.topics):
+        for _ in range(args.fanout):
+            keep.append(Sink())
+            provider.subscribe('topic.{}'.format(topic), keep[-1])
+    keep.append(Joiner(provider, 'topic.0', keep))
+    provider.subscribe('topic.0', keep[-1])
+    topics = ['topic.{}'.format(topic) for topic in range(args.topics)]
+    for i in range(args.messages):
+        provider.notify(topics[i % args.topics])
+    return provider
+
+
+def _pro(args, keep):
+    provider = publish_subscribe_pro.Provider()
+    for topic in range(args.topics):
+        for _ in range(args.fanout):
+            keep.append(Sink())
+            provider.subscribe('publisher {}'.format(topic), keep[-1])
+    keep.append(Joiner(provider, 'publisher 0', keep))
+    provider.subscribe('publisher 0', keep[-1])
+    names = ['publisher {}'.format(topic) for topic in range(args.topics + 1)]
+    # one publisher more than there are subscribed ones
+    for i in range(args.messages):
+        provider.notify(names[i % len(names)], i)
+    return provider
+
+
+PROVIDERS = {'publish_subscribe': _basic, 'publish_subscribe_pro': _pro}
+
+
+def bench(name, args):
+    keep = []
+    provider = PROVIDERS[name](args, keep)
+    # a first round fills the caches
+    provider.update()
+    provider = PROVIDERS[name](args, keep)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = tracemalloc.get_traced_memory()[0]
+    provider.update()
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'lineno') if stat.count_diff > 0)
+    return {
+        'provider': name,
+        'messages': args.messages,
+        'python': sys.version.split()[0],
+        'peak_bytes': peak - start,
+        'retained_bytes': current - start,
+        'retained_blocks': blocks,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--provider', choices=sorted(PROVIDERS) + ['all'], default='all')
+    parser.add_argument('--topics', type=int, default=10)
+    parser.add_argument('--fanout', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=100000)
+    args = parser.parse_args(argv)
+    names = sorted(PROVIDERS) if args.provider == 'all' else [args.provider]
+    for name in names:
+        print(json.dumps(bench(name, args), sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
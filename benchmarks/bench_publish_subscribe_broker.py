@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+In-process Provider against the Unix socket broker.
+
+Sends the same messages to one subscriber through
+    in_process  publish_subscribe.Provider, publish + update()
+    broker      RemotePublisher -> Broker process -> RemoteSubscriber
+and prints one JSON line per transport with the end to end msgs/s, i.e.
+until the subscriber has run every message.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_publish_subscribe_broker.py --messages 200000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from time import perf_counter
+
+from patterns.behavioral.publish_subscribe import Provider
+from patterns.behavioral.publish_subscribe_broker__py3 import RemotePublisher, RemoteSubscriber, serve
+
+
+class Counter(object):
+    def __init__(self):
+        self.count = 0
+
+    def run(self, msg):
+        self.count += 1
+
+
+def in_process(messages, topic):
+    provider = Provider()
+    sub = Counter()
+    provider.subscribe(topic, sub)
+    started = perf_counter()
+    for _ in range(messages):
+        provider.notify(topic)
+    provider.update()
+    return perf_counter() - started
+
+
+def broker(messages, topic):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'broker.sock')
+    process = multiprocessing.Process(target=serve, args=(path,))
+    process.start()
+    try:
+        while not os.path.exists(path):
+            time.sleep(0.01)
+        sub = RemoteSubscriber('bench', path)
+        sub.subscribe(topic)
+        counter = Counter()
+        sub.run = counter.run
+        pub = RemotePublisher(path)
+        started = perf_counter()
+        for _ in range(messages):
+            pub.publish(topic)
+            # keep the socket buffers from filling up in one direction only
+            if sub.deliveries or pub.sent - counter.count > 10000:
+                sub.poll()
+        pub.flush()
+        while counter.count < messages:
+            sub.poll(1)
+        elapsed = perf_counter() - started
+        pub.close()
+        sub.close()
+        return elapsed
+    finally:
+        process.terminate()
+        process.join()
+        shutil.rmtree(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--size', type=int, default=16, help='message size in bytes')
+    args = parser.parse_args(argv)
+    topic = 'bench.' + 'x' * max(args.size - 6, 0)
+    for name, transport in (('in_process', in_process), ('broker', broker)):
+        elapsed = transport(args.messages, topic)
+        result = {'transport': name, 'messages': args.messages, 'size': len(topic), 'elapsed_s': elapsed,
+                  'msgs_per_sec': args.messages / elapsed}
+        print(json.dumps(result, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
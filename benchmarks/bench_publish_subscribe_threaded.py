@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publishing from many threads: one lock against per-thread queues.
+
+Every producer thread publishes the same number of messages to
+    locked    publish_subscribe.Provider behind one lock shared by
+              notify() and a consumer thread calling update()
+    threaded  publish_subscribe_threaded.ThreadedProvider
+and one JSON line per transport and producer count gives the end to end
+msgs/s and the notify() percentiles, which is where producers contend.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_publish_subscribe_threaded.py --producers 1 8 32
+"""
+
+import argparse
+import json
+import sys
+import threading
+from time import perf_counter
+
+from patterns.behavioral.publish_subscribe import Provider
+from patterns.behavioral.publish_subscribe_threaded import ThreadedProvider
+
+
+class Counter(object):
+    def __init__(self):
+        self.count = 0
+
+    def run(self, msg):
+        self.count += 1
+
+
+class LockedProvider(object):
+    """The plain Provider made thread safe the obvious way."""
+
+    def __init__(self):
+        self.provider = Provider()
+        self.lock = threading.Lock()
+        self.running = True
+        self.consumer = threading.Thread(target=self._consume)
+        self.consumer.start()
+
+    def subscribe(self, topic, sub):
+        with self.lock:
+            self.provider.subscribe(topic, sub)
+
+    def notify(self, msg):
+        with self.lock:
+            self.provider.notify(msg)
+
+    def _consume(self):
+        while self.running:
+            with self.lock:
+                self.provider.update()
+
+    def update(self):
+        with self.lock:
+            self.provider.update()
+
+    def close(self):
+        self.running = False
+        self.consumer.join()
+        self.update()
+
+
+def _percentiles(values):
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1e6
+    return {'p50': pick(0.5), 'p99': pick(0.99), 'max': values[-1] * 1e6}
+
+
+def bench(provider, producers, messages, topic):
+    counter = Counter()
+    provider.subscribe(topic, counter)
+    timings = []
+    start = threading.Event()
+
+    def produce():
+        own = [0.0] * messages
+        start.wait()
+        for i in range(messages):
+            began = perf_counter()
+            provider.notify(topic)
+            own[i] = perf_counter() - began
+        timings.extend(own)
+
+    threads = [threading.Thread(target=produce) for _ in range(producers)]
+    for thread in threads:
+        thread.start()
+    started = perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    provider.update()
+    elapsed = perf_counter() - started
+    provider.close()
+    assert counter.count == producers * messages
+    return elapsed, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--producers', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--messages', type=int, default=20000, help='messages per producer')
+    args = parser.parse_args(argv)
+    for producers in args.producers:
+        for name, factory in (('locked', LockedProvider), ('threaded', ThreadedProvider)):
+            elapsed, timings = bench(factory(), producers, args.messages, 'bench')
+            total = producers * args.messages
+            result = {'provider': name, 'producers': producers, 'messages': total, 'elapsed_s': elapsed,
+                      'msgs_per_sec': total / elapsed, 'notify_us': _percentiles(timings),
+                      'python': sys.version.split()[0]}
+            print(json.dumps(result, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,37 +11,275 @@ Maintains a list of dependents and notifies them of any state changes.
 *Examples in Python ecosystem:
 Django Signals: https://docs.djangoproject.com/en/2.1/topics/signals/
 Flask Signals: http://flask.pocoo.org/docs/1.0/signals/
+
+A Subject only holds weak references to its observers, in the order they
+were attached: attach() and detach() take constant time however many
+observers there are, and an observer that is garbage collected is
+detached by itself.
+
+Changes made in a ``with subject.batch():`` block notify every observer
+only once, at the end of the block, and a Subject created with
+coalesce=True keeps collecting changes until flush() is called. Either
+way, the observers see the final state, and subject.changed tells them
+which fields changed since their last update.
+
+A Subject given an executor (e.g. a concurrent.futures.ThreadPoolExecutor)
+updates its observers concurrently on it. An observer that raises or does
+not finish within ``timeout`` seconds of starting does not affect the
+others, and notify() returns an ObserverReport per observer, the slowest
+one first. An observer still waiting for a worker once the ones before it
+are done gets ``timeout`` seconds to start, and is cancelled otherwise.
+
+Observers may be attached for some fields only, attach(observer,
+fields=['data']), and are then only updated when one of those fields
+changed. Data only notifies when a new value differs from the old one.
+Bytes-like values are compared by a copy, large ones by digest, and other
+unhashable values by a deep copy, so that changes made in place are
+caught too; an unhashable value that cannot be copied always counts as
+changed.
 """
 
 from __future__ import print_function
 
+import copy
+import hashlib
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+ObserverReport = namedtuple('ObserverReport', 'observer elapsed error')
+
+
+class ObserverTimeout(Exception):
+    pass
+
+
+class WeakObserverSet(object):
+    """Observers in attachment order, each one once, weakly referenced.
+
+    Objects that cannot be weakly referenced are kept alive instead."""
 
-class Subject(object):
     def __init__(self):
-        self._observers = []
+        # id(observer) -> weak reference
+        self._refs = OrderedDict()
+        # id(observer) -> value stored along with it
+        self._values = {}
+
+    def _remover(self, key):
+        refs = self._refs
+        values = self._values
+
+        def remove(ref):
+            if refs.get(key) is ref:
+                del refs[key]
+                values.pop(key, None)
+
+        return remove
+
+    def add(self, observer, value=None):
+        """Add ``observer``, or replace the value stored with it."""
+        key = id(observer)
+        ref = self._refs.get(key)
+        if ref is None or ref() is not observer:
+            try:
+                self._refs[key] = weakref.ref(observer, self._remover(key))
+            except TypeError:
+                self._refs[key] = lambda: observer
+        self._values[key] = value
+
+    def discard(self, observer):
+        ref = self._refs.get(id(observer))
+        if ref is not None and ref() is observer:
+            del self._refs[id(observer)]
+            self._values.pop(id(observer), None)
+
+    def items(self):
+        """Pairs of observer and value, like iterating the set."""
+        for key, ref in list(self._refs.items()):
+            observer = ref()
+            if observer is not None:
+                yield observer, self._values.get(key)
+
+    def __contains__(self, observer):
+        ref = self._refs.get(id(observer))
+        return ref is not None and ref() is observer
 
-    def attach(self, observer):
-        if observer not in self._observers:
-            self._observers.append(observer)
+    def __iter__(self):
+        # a snapshot, so observers may attach and detach while notified
+        for ref in list(self._refs.values()):
+            observer = ref()
+            if observer is not None:
+                yield observer
+
+    def __len__(self):
+        return len(self._refs)
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+
+_MISSING = object()
+
+
+class Subject(object):
+    # bytes-like values at least this long are compared by digest
+    DIGEST_SIZE = 1 << 12
+
+    def __init__(self, coalesce=False, executor=None, timeout=None):
+        self._observers = WeakObserverSet()
+        self.coalesce = coalesce
+        self.executor = executor
+        self.timeout = timeout
+        # reports of the last concurrent notification, slowest first
+        self.last_report = []
+        # fields changed during the notification in progress
+        self.changed = frozenset()
+        self._batches = 0
+        self._dirty = False
+        self._modifier = None
+        self._changed = set()
+        # field -> value or digest it was last notified with
+        self._fingerprints = {}
+        self.skipped_updates = 0
+
+    def attach(self, observer, fields=None):
+        """Update ``observer`` on changes of ``fields``, of any field if None."""
+        self._observers.add(observer, None if fields is None else frozenset(fields))
 
     def detach(self, observer):
+        self._observers.discard(observer)
+
+    def notify(self, modifier=None, changed=()):
+        if not (self._batches or self.coalesce):
+            return self._notify(modifier, frozenset(changed))
+        if not self._dirty:
+            self._dirty = True
+            self._modifier = modifier
+        elif modifier != self._modifier:
+            # changes of different modifiers concern every observer
+            self._modifier = None
+        self._changed.update(changed)
+
+    def has_changed(self, field, value):
+        """Remember ``value`` of ``field``; return False if it equals the last one."""
+        if isinstance(value, (bytes, bytearray)):
+            if len(value) >= self.DIGEST_SIZE:
+                fingerprint = (len(value), hashlib.md5(value).digest())
+            else:
+                # a copy, the buffer itself may be changed in place
+                fingerprint = bytes(value)
+        elif getattr(value, '__hash__', None) is None:
+            # mutable, it may be changed in place before it is set again
+            try:
+                fingerprint = copy.deepcopy(value)
+            except Exception:
+                # compares as changed next time
+                fingerprint = _MISSING
+        else:
+            fingerprint = value
+        previous = self._fingerprints.get(field, _MISSING)
+        self._fingerprints[field] = fingerprint
+        if previous is _MISSING or type(previous) is not type(fingerprint):
+            return True
         try:
-            self._observers.remove(observer)
-        except ValueError:
-            pass
+            return bool(previous != fingerprint)
+        except Exception:  # e.g. arrays that compare element-wise
+            return True
+
+    def _notify(self, modifier, changed):
+        self.changed = changed
+        observers = []
+        for observer, fields in self._observers.items():
+            if modifier == observer:
+                continue
+            # a change of unknown fields concerns everyone
+            if fields is None or not changed or fields & changed:
+                observers.append(observer)
+            else:
+                self.skipped_updates += 1
+        if self.executor is not None:
+            return self._notify_concurrently(observers)
+        for observer in observers:
+            observer.update(self)
 
-    def notify(self, modifier=None):
-        for observer in self._observers:
-            if modifier != observer:
-                observer.update(self)
+    def _timed_update(self, observer, start=None):
+        started = _timer()
+        if start is not None:
+            # read by _notify_concurrently, which applies the timeout from here
+            start.append(started)
+        try:
+            observer.update(self)
+        except Exception as error:
+            return _timer() - started, error
+        return _timer() - started, None
+
+    def _notify_concurrently(self, observers):
+        calls = []
+        for observer in observers:
+            start = []
+            calls.append((observer, start, self.executor.submit(self._timed_update, observer, start)))
+        report = []
+        for observer, start, future in calls:
+            waiting = _timer()
+            while True:
+                if self.timeout is None:
+                    remaining = None
+                else:
+                    remaining = max(0, (start[0] if start else waiting) + self.timeout - _timer())
+                try:
+                    elapsed, error = future.result(remaining)
+                    break
+                except Exception:
+                    pass
+                if start:
+                    if start[0] + self.timeout <= _timer():
+                        # still running, it is left to finish on its own
+                        elapsed = _timer() - start[0]
+                        error = ObserverTimeout('no update within {} seconds'.format(self.timeout))
+                        break
+                elif future.cancel():
+                    elapsed = 0.0
+                    error = ObserverTimeout('not started within {} seconds'.format(self.timeout))
+                    break
+                # started in the meantime, wait for its own deadline
+            report.append(ObserverReport(observer, elapsed, error))
+        report.sort(key=lambda entry: entry.elapsed, reverse=True)
+        self.last_report = report
+        return report
+
+    @contextmanager
+    def batch(self):
+        """Notify the observers once, after the block, of all its changes."""
+        self._batches += 1
+        try:
+            yield self
+        finally:
+            self._batches -= 1
+            if not self._batches and not self.coalesce:
+                self.flush()
+
+    def flush(self):
+        """Notify the observers of the changes collected so far, if any."""
+        if not self._dirty:
+            return
+        modifier, changed = self._modifier, frozenset(self._changed)
+        self._dirty = False
+        self._modifier = None
+        self._changed.clear()
+        self._notify(modifier, changed)
 
 
 # Example usage
 class Data(Subject):
-    def __init__(self, name=''):
-        Subject.__init__(self)
+    def __init__(self, name='', **options):
+        Subject.__init__(self, **options)
         self.name = name
         self._data = 0
+        self.has_changed('data', 0)
 
     @property
     def data(self):
@@ -50,7 +288,8 @@ class Data(Subject):
     @data.setter
     def data(self, value):
         self._data = value
-        self.notify()
+        if self.has_changed('data', value):
+            self.notify(changed=('data',))
 
 
 class HexViewer:
@@ -100,6 +339,15 @@ def main():
 
     >>> data2.data = 15
     DecimalViewer: Subject Data 2 has data 15
+
+    # Many changes in a batch notify once, with the final value
+    >>> with data1.batch():
+    ...     for value in range(100):
+    ...         data1.data = value
+    DecimalViewer: Subject Data 1 has data 99
+
+    # Assigning the same value again notifies nobody
+    >>> data1.data = 99
     """
 
 
@@ -4,51 +4,313 @@
 Reference:
 http://www.slideshare.net/ishraqabd/publish-subscribe-model-overview-13368808
 Author: https://github.com/HanWenfang
+
+Topics are hierarchical: "sports.football.uk" has three levels separated
+by dots. A subscription may use wildcards in place of whole levels,
+"*" matches exactly one level and "#" matches zero or more levels, so
+"sports.*" receives "sports.tennis" and "sports.#" receives every topic
+under "sports" (and "sports" itself).
+
+Subscriptions are kept in a TopicTrie, so resolving a topic walks at most
+one branch per level instead of testing every subscription. The resolved
+subscriber tuple is cached per topic until a subscription whose pattern
+matches the topic changes; the cached topics are kept in a trie of their
+own, so a change only looks up the topics its pattern can match.
+
+The provider only holds weak references to its subscribers: subscribe()
+returns a Subscription handle to cancel the subscription, and a subscriber
+that is garbage collected drops out of all of its topics by itself.
+
+A Provider created with batch=True groups the queued messages by topic and
+hands every subscriber all of its messages in one run_batch() call instead
+of one run() call per message.
+
+msg_queue can be replaced by any object with append(), popleft() and
+len(); Publisher.publish(msg, **options) passes the extra options on to
+its append(). publish_subscribe_queues has queues that order messages by
+priority, conflate them or drop duplicates.
+
+publish(msg, delay=2) queues the message two seconds later, and
+publish(msg, interval=60) every minute, both return a Timer handle to
+cancel it. Scheduled messages wait in a publish_subscribe_queues.TimingWheel
+and move to msg_queue in the first update() after they are due.
+
+A Subscriber prints every message it gets unless it is given a sink, e.g.
+one of publish_subscribe_sinks, which collects the lines and writes them
+out in chunks.
 """
 
+import weakref
+from collections import OrderedDict, deque
+
+
+class _TrieNode(object):
+    __slots__ = ('children', 'pattern')
 
-class Provider:
     def __init__(self):
-        self.msg_queue = []
+        self.children = {}
+        self.pattern = None
+
+
+class TopicTrie(object):
+    """Index of subscription patterns, one trie level per topic level."""
+
+    SEPARATOR = '.'
+    ONE_LEVEL = '*'
+    ANY_LEVELS = '#'
+
+    def __init__(self):
+        self._root = _TrieNode()
+
+    def insert(self, pattern):
+        node = self._root
+        for word in pattern.split(self.SEPARATOR):
+            node = node.children.setdefault(word, _TrieNode())
+        node.pattern = pattern
+
+    def remove(self, pattern):
+        path = [self._root]
+        words = pattern.split(self.SEPARATOR)
+        for word in words:
+            node = path[-1].children.get(word)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].pattern = None
+        # prune the branches that no longer lead to a pattern
+        for depth in range(len(words), 0, -1):
+            node = path[depth]
+            if node.pattern is not None or node.children:
+                break
+            del path[depth - 1].children[words[depth - 1]]
+
+    def match(self, topic):
+        """Return the patterns matching ``topic``, each one only once."""
+        found = []
+        self._match(self._root, topic.split(self.SEPARATOR), 0, found)
+        seen = set()
+        return [p for p in found if not (p in seen or seen.add(p))]
+
+    def _match(self, node, words, i, found):
+        children = node.children
+        if i == len(words):
+            if node.pattern is not None:
+                found.append(node.pattern)
+        else:
+            for word in (words[i], self.ONE_LEVEL):
+                child = children.get(word)
+                if child is not None:
+                    self._match(child, words, i + 1, found)
+        child = children.get(self.ANY_LEVELS)
+        if child is not None:
+            for j in range(i, len(words) + 1):
+                self._match(child, words, j, found)
+
+    def covered(self, pattern):
+        """Return the stored topics that ``pattern`` matches, each one only
+        once; the reverse of match(), for a trie of plain topics."""
+        found = []
+        self._covered(self._root, pattern.split(self.SEPARATOR), 0, found)
+        seen = set()
+        return [t for t in found if not (t in seen or seen.add(t))]
+
+    def _covered(self, node, words, i, found):
+        if i == len(words):
+            if node.pattern is not None:
+                found.append(node.pattern)
+            return
+        word = words[i]
+        if word == self.ANY_LEVELS:
+            # no level at all, or one more level for the same "#"
+            self._covered(node, words, i + 1, found)
+            for child in node.children.values():
+                self._covered(child, words, i, found)
+        elif word == self.ONE_LEVEL:
+            for child in node.children.values():
+                self._covered(child, words, i + 1, found)
+        else:
+            child = node.children.get(word)
+            if child is not None:
+                self._covered(child, words, i + 1, found)
+
+
+class Subscription(object):
+    """Handle of one subscription, cancel() ends it."""
+
+    __slots__ = ('provider', 'topic', 'key', 'ref')
+
+    def __init__(self, provider, topic, key, ref):
+        self.provider = provider
+        self.topic = topic
+        self.key = key
+        self.ref = ref
+
+    def cancel(self):
+        self.provider._discard(self.topic, self.key, self.ref)
+
+
+class Provider:
+    # resolved topics are forgotten in one go once the cache grows this big
+    MATCH_CACHE_SIZE = 65536
+
+    def __init__(self, batch=False, msg_queue=None, timers=None):
+        self.batch = batch
+        self.msg_queue = deque() if msg_queue is None else msg_queue
+        # created by the first delayed message unless one is given
+        self.timers = timers
+        # topic -> OrderedDict of id(subscriber) -> weak reference
         self.subscribers = {}
+        self._topics = TopicTrie()
+        self._matches = {}
+        # the topics in _matches, to find those a changed pattern matches
+        self._cached = TopicTrie()
+        self._dead = []
+
+    def notify(self, msg, delay=None, interval=None, **options):
+        if delay is None and interval is None:
+            self.msg_queue.append(msg, **options)
+            return None
+        if self.timers is None:
+            # imported here, the queues module needs TopicTrie from this one
+            from patterns.behavioral.publish_subscribe_queues import TimingWheel
+
+            self.timers = TimingWheel()
+        return self.timers.schedule(msg, delay or 0, interval, **options)
 
-    def notify(self, msg):
-        self.msg_queue.append(msg)
+    def _expire_timers(self):
+        if self.timers is not None:
+            for timer in self.timers.expire():
+                self.msg_queue.append(timer.msg, **timer.options)
 
     def subscribe(self, msg, subscriber):
-        self.subscribers.setdefault(msg, []).append(subscriber)
+        self._purge()
+        registry = self.subscribers.setdefault(msg, OrderedDict())
+        if not registry:
+            self._topics.insert(msg)
+        key = id(subscriber)
+        ref = registry[key] = weakref.ref(subscriber, self._reaper(msg, key))
+        self._invalidate(msg)
+        return Subscription(self, msg, key, ref)
 
     def unsubscribe(self, msg, subscriber):
-        self.subscribers[msg].remove(subscriber)
+        self._discard(msg, id(subscriber))
+
+    def _discard(self, topic, key, ref=None):
+        registry = self.subscribers.get(topic)
+        if not registry or key not in registry:
+            return
+        # the id of a collected subscriber may already belong to a new one
+        if ref is not None and registry[key] is not ref:
+            return
+        del registry[key]
+        if not registry:
+            self._topics.remove(topic)
+        self._invalidate(topic)
+
+    def _invalidate(self, pattern):
+        """Forget the resolved topics that ``pattern`` matches."""
+        for topic in self._cached.covered(pattern):
+            del self._matches[topic]
+            self._cached.remove(topic)
+
+    def _reaper(self, topic, key):
+        dead = self._dead
+
+        def reap(ref):
+            # may run in the middle of anything, so only take note here;
+            # the cached dead reference resolves to None until purged
+            dead.append((topic, key, ref))
+
+        return reap
+
+    def _purge(self):
+        while self._dead:
+            self._discard(*self._dead.pop())
+
+    def _resolve(self, topic):
+        """Return the weak references to the subscribers of ``topic``."""
+        if self._dead:
+            self._purge()
+        try:
+            return self._matches[topic]
+        except KeyError:
+            pass
+        refs, seen = [], set()
+        for pattern in self._topics.match(topic):
+            for key, ref in self.subscribers[pattern].items():
+                if key not in seen:
+                    seen.add(key)
+                    refs.append(ref)
+        if len(self._matches) >= self.MATCH_CACHE_SIZE:
+            self._matches.clear()
+            self._cached = TopicTrie()
+        refs = self._matches[topic] = tuple(refs)
+        self._cached.insert(topic)
+        return refs
+
+    def match(self, topic):
+        """Return the subscribers of ``topic``, each one only once."""
+        subscribers = (ref() for ref in self._resolve(topic))
+        return tuple(sub for sub in subscribers if sub is not None)
 
     def update(self):
-        for msg in self.msg_queue:
-            for sub in self.subscribers.get(msg, []):
-                sub.run(msg)
-        self.msg_queue = []
+        self._expire_timers()
+        if self.batch:
+            return self._update_batches()
+        queue = self.msg_queue
+        while queue:
+            msg = queue.popleft()
+            for ref in self._resolve(msg):
+                sub = ref()
+                if sub is not None:
+                    sub.run(msg)
+
+    def _update_batches(self):
+        queue = self.msg_queue
+        topics = OrderedDict()
+        while queue:
+            msg = queue.popleft()
+            topics.setdefault(msg, []).append(msg)
+        # messages keep their order within a topic, topics follow each other
+        batches = OrderedDict()
+        for topic, msgs in topics.items():
+            for sub in self.match(topic):
+                batches.setdefault(id(sub), (sub, []))[1].extend(msgs)
+        for sub, msgs in batches.values():
+            sub.run_batch(msgs)
 
 
 class Publisher:
     def __init__(self, msg_center):
         self.provider = msg_center
 
-    def publish(self, msg):
-        self.provider.notify(msg)
+    def publish(self, msg, **options):
+        return self.provider.notify(msg, **options)
 
 
 class Subscriber:
-    def __init__(self, name, msg_center):
+    def __init__(self, name, msg_center, sink=None):
         self.name = name
         self.provider = msg_center
+        # anything with a write(line) method, print() if there is none
+        self.sink = sink
 
     def subscribe(self, msg):
-        self.provider.subscribe(msg, self)
+        return self.provider.subscribe(msg, self)
 
     def unsubscribe(self, msg):
         self.provider.unsubscribe(msg, self)
 
     def run(self, msg):
-        print("{} got {}".format(self.name, msg))
+        line = "{} got {}".format(self.name, msg)
+        if self.sink is None:
+            print(line)
+        else:
+            self.sink.write(line)
+
+    def run_batch(self, msgs):
+        for msg in msgs:
+            self.run(msg)
 
 
 def main():
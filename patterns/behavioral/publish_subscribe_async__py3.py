@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publish/subscribe on top of asyncio.
+
+Every subscriber owns a bounded asyncio.Queue drained by its own consumer
+task, so a slow Subscriber.run() only delays its own messages. When a
+queue is full the publisher either waits for room (BLOCK, backpressure)
+or the message is dropped, the newest one (DROP_NEWEST) or the oldest
+queued one (DROP_OLDEST).
+
+Subscriber.run() may be a plain function or return an awaitable, which
+the consumer task awaits before taking the next message.
+
+Mailboxes are kept by id(subscriber) and only hold a weak reference to it,
+so a subscriber that is garbage collected drops out of its topics as with
+Provider, and its mailbox and consumer task go with it.
+"""
+
+import asyncio
+import inspect
+import weakref
+
+from patterns.behavioral.publish_subscribe import Provider, Subscriber
+
+BLOCK = 'block'
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+
+
+class Mailbox(object):
+    """Bounded queue and consumer task of one subscriber."""
+
+    def __init__(self, subscriber, maxsize, policy):
+        if policy not in (BLOCK, DROP_NEWEST, DROP_OLDEST):
+            raise ValueError('unknown policy: {!r}'.format(policy))
+        self.ref = weakref.ref(subscriber)
+        self.maxsize = maxsize
+        self.policy = policy
+        # the topics it is subscribed to, the mailbox goes with the last one
+        self.topics = set()
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.queue = None
+        self.task = None
+
+    def start(self):
+        # queues and tasks are created lazily so they bind to the running loop
+        if self.task is None:
+            self.queue = asyncio.Queue(self.maxsize)
+            self.task = asyncio.ensure_future(self._consume())
+
+    async def put(self, msg):
+        self.start()
+        if not self.queue.full():
+            self.queue.put_nowait(msg)
+        elif self.policy == BLOCK:
+            await self.queue.put(msg)
+        elif self.policy == DROP_NEWEST:
+            self.dropped += 1
+        else:
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.queue.put_nowait(msg)
+            self.dropped += 1
+
+    async def join(self):
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _consume(self):
+        while True:
+            msg = await self.queue.get()
+            try:
+                await self._deliver(msg)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, msg):
+        # a coroutine of its own, so that no reference to the subscriber
+        # is left behind while waiting for the next message
+        subscriber = self.ref()
+        if subscriber is None:
+            return
+        try:
+            result = subscriber.run(msg)
+            if inspect.isawaitable(result):
+                await result
+            self.delivered += 1
+        except asyncio.CancelledError:
+            # an Exception before Python 3.8
+            raise
+        except Exception:
+            # a failing subscriber must not stop its own queue
+            self.errors += 1
+
+
+class AsyncProvider(Provider):
+    def __init__(self, maxsize=1024, policy=BLOCK):
+        Provider.__init__(self)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.mailboxes = {}
+
+    def subscribe(self, msg, subscriber, maxsize=None, policy=None):
+        # a collected subscriber may have had the same id
+        self._purge()
+        key = id(subscriber)
+        mailbox = self.mailboxes.get(key)
+        if mailbox is None:
+            mailbox = self.mailboxes[key] = Mailbox(
+                subscriber, maxsize or self.maxsize, policy or self.policy
+            )
+        mailbox.topics.add(msg)
+        return Provider.subscribe(self, msg, subscriber)
+
+    def _discard(self, topic, key, ref=None):
+        # unsubscribe(), Subscription.cancel() and the purge of collected
+        # subscribers all end up here
+        current = self.subscribers.get(topic, {}).get(key)
+        Provider._discard(self, topic, key, ref)
+        if current is None or self.subscribers.get(topic, {}).get(key) is current:
+            return
+        mailbox = self.mailboxes.get(key)
+        if mailbox is None:
+            return
+        mailbox.topics.discard(topic)
+        if not mailbox.topics:
+            del self.mailboxes[key]
+            if mailbox.task is not None:
+                mailbox.task.cancel()
+
+    async def notify(self, msg):
+        for sub in self.match(msg):
+            await self.mailboxes[id(sub)].put(msg)
+
+    async def update(self):
+        """Wait until every queued message has been handled."""
+        await asyncio.gather(*[m.join() for m in list(self.mailboxes.values())])
+
+    async def close(self):
+        await asyncio.gather(*[m.close() for m in list(self.mailboxes.values())])
+
+    def stats(self):
+        return [
+            {
+                'subscriber': mailbox.ref(),
+                'queued': mailbox.queue.qsize() if mailbox.queue else 0,
+                'delivered': mailbox.delivered,
+                'dropped': mailbox.dropped,
+                'errors': mailbox.errors,
+            }
+            for mailbox in self.mailboxes.values()
+        ]
+
+
+class AsyncPublisher:
+    def __init__(self, msg_center):
+        self.provider = msg_center
+
+    async def publish(self, msg):
+        await self.provider.notify(msg)
+
+
+class SlowSubscriber(Subscriber):
+    def __init__(self, name, msg_center, delay):
+        Subscriber.__init__(self, name, msg_center)
+        self.delay = delay
+
+    async def run(self, msg):
+        await asyncio.sleep(self.delay)
+        Subscriber.run(self, msg)
+
+
+async def demo():
+    message_center = AsyncProvider(maxsize=2)
+
+    fftv = AsyncPublisher(message_center)
+
+    jim = Subscriber("jim", message_center)
+    jim.subscribe("cartoon")
+    gee = SlowSubscriber("gee", message_center, 0.01)
+    message_center.subscribe("cartoon", gee, policy=DROP_OLDEST)
+
+    for _ in range(4):
+        await fftv.publish("cartoon")
+
+    await message_center.update()
+    for stats in message_center.stats():
+        print("{} dropped {}".format(stats['subscriber'].name, stats['dropped']))
+    await message_center.close()
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(demo())
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got cartoon
+jim got cartoon
+jim got cartoon
+jim got cartoon
+gee got cartoon
+gee got cartoon
+gee got cartoon
+jim dropped 0
+gee dropped 1
+"""
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publish/subscribe between processes of one host.
+
+A Broker process owns an ordinary Provider and listens on a Unix domain
+socket. RemotePublisher and RemoteSubscriber talk to it with a compact
+binary protocol, every frame being
+    4 bytes  length of the body, big-endian
+    1 byte   frame type
+    n bytes  body
+with the frame types
+    P  publish      client -> broker   body: message
+    S  subscribe    client -> broker   body: topic pattern
+    U  unsubscribe  client -> broker   body: topic pattern
+    D  deliver      broker -> client   body: message
+    A  acknowledge  broker -> client   body: 8 byte count of requests done
+Clients pipeline their requests: publish() only appends a frame to a
+buffer that is sent once it is large enough or on flush(). The broker
+answers everything it read in one go with a single acknowledgement, and
+flush() waits until all requests sent so far have been acknowledged.
+
+A connected RemoteSubscriber stands in the broker's Provider for the
+subscriber on the other side of the socket, so topic wildcards work as
+with Provider.
+"""
+
+import os
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+
+from patterns.behavioral.publish_subscribe import Provider
+
+HEADER = struct.Struct('>IB')
+COUNT = struct.Struct('>Q')
+PUBLISH, SUBSCRIBE, UNSUBSCRIBE, DELIVER, ACK = b'PSUDA'
+
+
+def frame(kind, body):
+    return HEADER.pack(len(body), kind) + body
+
+
+def parse(buffer):
+    """Cut the complete frames off the front of ``buffer``."""
+    frames = []
+    start = 0
+    while len(buffer) - start >= HEADER.size:
+        length, kind = HEADER.unpack_from(buffer, start)
+        end = start + HEADER.size + length
+        if end > len(buffer):
+            break
+        frames.append((kind, bytes(buffer[start + HEADER.size:end])))
+        start = end
+    del buffer[:start]
+    return frames
+
+
+class _Connection(object):
+    """Broker side of one client, subscribed to the Provider in its name."""
+
+    def __init__(self, sock, pending):
+        self.sock = sock
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.pending = pending
+
+    def run(self, msg):
+        self.outbox += frame(DELIVER, msg.encode('utf-8'))
+        self.pending.add(self)
+
+
+class Broker(object):
+    def __init__(self, path):
+        self.path = path
+        self.provider = Provider()
+        self.connections = {}
+        # connections with something in their outbox
+        self.pending = set()
+        self.selector = selectors.DefaultSelector()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen(64)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self._running = False
+
+    def serve_forever(self, poll_interval=0.1):
+        self._running = True
+        while self._running:
+            for key, events in self.selector.select(poll_interval):
+                if key.fileobj is self.listener:
+                    self._accept()
+                    continue
+                connection = self.connections.get(key.fileobj)
+                if connection is None:
+                    continue
+                if events & selectors.EVENT_READ:
+                    self._read(connection)
+                # reading may have found the client gone
+                if events & selectors.EVENT_WRITE and connection.sock in self.connections:
+                    self._write(connection)
+        self._close()
+
+    def shutdown(self):
+        self._running = False
+
+    def _accept(self):
+        sock, _ = self.listener.accept()
+        sock.setblocking(False)
+        self.connections[sock] = _Connection(sock, self.pending)
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def _read(self, connection):
+        try:
+            data = connection.sock.recv(1 << 16)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            return self._drop(connection)
+        connection.inbox += data
+        frames = parse(connection.inbox)
+        for kind, body in frames:
+            try:
+                topic = body.decode('utf-8')
+            except UnicodeDecodeError:
+                # a client that sends garbage is not worth keeping
+                return self._drop(connection)
+            if kind == PUBLISH:
+                self.provider.notify(topic)
+            elif kind == SUBSCRIBE:
+                self.provider.subscribe(topic, connection)
+            elif kind == UNSUBSCRIBE:
+                self.provider.unsubscribe(topic, connection)
+        if frames:
+            connection.outbox += frame(ACK, COUNT.pack(len(frames)))
+            self.pending.add(connection)
+        self.provider.update()
+        while self.pending:
+            self._write(self.pending.pop())
+
+    def _write(self, connection):
+        if connection.sock not in self.connections:
+            return
+        try:
+            sent = connection.sock.send(connection.outbox)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            return self._drop(connection)
+        del connection.outbox[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if connection.outbox else 0)
+        self.selector.modify(connection.sock, events)
+
+    def _drop(self, connection):
+        self.pending.discard(connection)
+        self.selector.unregister(connection.sock)
+        del self.connections[connection.sock]
+        for topic, registry in list(self.provider.subscribers.items()):
+            if id(connection) in registry:
+                self.provider.unsubscribe(topic, connection)
+        connection.sock.close()
+
+    def _close(self):
+        for connection in list(self.connections.values()):
+            self._drop(connection)
+        self.selector.unregister(self.listener)
+        self.listener.close()
+        self.selector.close()
+        os.unlink(self.path)
+
+
+def serve(path):
+    """Run a broker on ``path`` until the process is terminated."""
+    Broker(path).serve_forever()
+
+
+class _Client(object):
+    # pending requests are sent once their frames add up to this many bytes
+    PIPELINE_BYTES = 1 << 16
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.deliveries = []
+        self.sent = 0
+        self.acknowledged = 0
+
+    def _request(self, kind, body):
+        self.outbox += frame(kind, body)
+        self.sent += 1
+        if len(self.outbox) >= self.PIPELINE_BYTES:
+            self._send()
+
+    def _send(self):
+        self.sock.sendall(self.outbox)
+        del self.outbox[:]
+
+    def _receive(self, timeout=None):
+        self.sock.settimeout(timeout)
+        try:
+            data = self.sock.recv(1 << 16)
+        except (socket.timeout, BlockingIOError):
+            return
+        if not data:
+            raise ConnectionError('the broker closed the connection')
+        self.inbox += data
+        for kind, body in parse(self.inbox):
+            if kind == ACK:
+                self.acknowledged += COUNT.unpack(body)[0]
+            elif kind == DELIVER:
+                self.deliveries.append(body.decode('utf-8'))
+
+    def flush(self):
+        """Send the pending requests and wait until the broker did them."""
+        self._send()
+        while self.acknowledged < self.sent:
+            self._receive()
+
+    def close(self):
+        self.flush()
+        self.sock.close()
+
+
+class RemotePublisher(_Client):
+    def publish(self, msg):
+        self._request(PUBLISH, msg.encode('utf-8'))
+
+
+class RemoteSubscriber(_Client):
+    def __init__(self, name, path):
+        _Client.__init__(self, path)
+        self.name = name
+
+    def subscribe(self, msg):
+        self._request(SUBSCRIBE, msg.encode('utf-8'))
+        self.flush()
+
+    def unsubscribe(self, msg):
+        self._request(UNSUBSCRIBE, msg.encode('utf-8'))
+        self.flush()
+
+    def poll(self, timeout=0):
+        """Run the messages that arrived, waiting up to ``timeout`` seconds
+        for the first one. Returns how many were run."""
+        if not self.deliveries:
+            self._receive(timeout)
+        deliveries, self.deliveries = self.deliveries, []
+        for msg in deliveries:
+            self.run(msg)
+        return len(deliveries)
+
+    def run(self, msg):
+        print("{} got {}".format(self.name, msg))
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), 'broker.sock')
+    broker = Broker(path)
+    thread = threading.Thread(target=broker.serve_forever)
+    thread.start()
+    try:
+        jim = RemoteSubscriber("jim", path)
+        jim.subscribe("cartoon")
+        gee = RemoteSubscriber("gee", path)
+        gee.subscribe("sports.#")
+
+        fftv = RemotePublisher(path)
+        fftv.publish("cartoon")
+        fftv.publish("sports.tennis")
+        fftv.publish("movie")
+        fftv.publish("cartoon")
+        fftv.flush()
+
+        received = 0
+        while received < 2:
+            received += jim.poll(1)
+        gee.poll(1)
+        for client in (jim, gee, fftv):
+            client.close()
+    finally:
+        broker.shutdown()
+        thread.join()
+        os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got cartoon
+jim got cartoon
+gee got sports.tennis
+"""
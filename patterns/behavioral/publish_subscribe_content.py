@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Content-based publish/subscribe.
+
+Messages are dicts of fields and a subscription is a filter on those
+fields instead of a topic name:
+    {"region": "eu", "size >": 100}
+matches every message whose region is "eu" and whose size is larger than
+100. A plain field name tests for equality, "field op" with op one of
+==, <, <=, >, >= compares with the given value.
+
+ContentIndex avoids testing every filter against every message. Equality
+predicates live in a hash table per field, range predicates in an array
+per field and operator that is kept sorted by threshold, so the satisfied
+ones are a slice found by bisection. Matching a message counts, per
+subscription, how many of its predicates the message satisfies; only
+the subscriptions where that count reaches the number of predicates
+match.
+"""
+
+from __future__ import print_function
+
+import bisect
+from collections import deque
+
+from patterns.behavioral.publish_subscribe import Subscriber
+
+OPERATORS = ('==', '<', '<=', '>', '>=')
+
+
+def parse(content_filter):
+    """Turn a filter dict into (field, operator, value) predicates."""
+    predicates = []
+    for key, value in content_filter.items():
+        field, _, op = key.strip().partition(' ')
+        op = op.strip() or '=='
+        if op not in OPERATORS:
+            raise ValueError('unknown operator {!r} in {!r}'.format(op, key))
+        predicates.append((field, op, value))
+    return predicates
+
+
+class _Range(object):
+    """Predicates ``field op threshold`` of one field and operator."""
+
+    __slots__ = ('thresholds', 'ids')
+
+    def __init__(self):
+        self.thresholds = []
+        self.ids = []
+
+    def add(self, threshold, sid):
+        i = bisect.bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.ids.insert(i, sid)
+
+    def remove(self, threshold, sid):
+        i = bisect.bisect_left(self.thresholds, threshold)
+        i += self.ids[i:].index(sid)
+        del self.thresholds[i]
+        del self.ids[i]
+
+    def satisfied(self, op, value):
+        """Return the ids of the predicates ``value op threshold`` holds for."""
+        if op == '>':
+            return self.ids[:bisect.bisect_left(self.thresholds, value)]
+        if op == '>=':
+            return self.ids[:bisect.bisect_right(self.thresholds, value)]
+        if op == '<':
+            return self.ids[bisect.bisect_right(self.thresholds, value):]
+        return self.ids[bisect.bisect_left(self.thresholds, value):]
+
+
+class ContentIndex(object):
+    def __init__(self):
+        self._equal = {}
+        self._ranges = {}
+        self._sizes = {}
+        self._predicates = {}
+        self._match_all = set()
+
+    def add(self, sid, predicates):
+        self._predicates[sid] = predicates
+        self._sizes[sid] = len(predicates)
+        if not predicates:
+            self._match_all.add(sid)
+        for field, op, value in predicates:
+            if op == '==':
+                self._equal.setdefault(field, {}).setdefault(value, set()).add(sid)
+            else:
+                self._ranges.setdefault(field, {}).setdefault(op, _Range()).add(value, sid)
+
+    def remove(self, sid):
+        predicates = self._predicates.pop(sid)
+        del self._sizes[sid]
+        self._match_all.discard(sid)
+        for field, op, value in predicates:
+            if op == '==':
+                self._equal[field][value].discard(sid)
+            else:
+                self._ranges[field][op].remove(value, sid)
+
+    def match(self, msg):
+        """Return the ids of the subscriptions matching ``msg``, in order."""
+        counts = {}
+        for field, value in msg.items():
+            try:
+                satisfied = list(self._equal.get(field, {}).get(value, ()))
+            except TypeError:  # unhashable values never equal a predicate
+                satisfied = []
+            for op, predicates in self._ranges.get(field, {}).items():
+                try:
+                    satisfied.extend(predicates.satisfied(op, value))
+                except TypeError:  # not comparable with the thresholds
+                    pass
+            for sid in satisfied:
+                counts[sid] = counts.get(sid, 0) + 1
+        sizes = self._sizes
+        matched = [sid for sid, count in counts.items() if count == sizes[sid]]
+        matched.extend(self._match_all)
+        return sorted(matched)
+
+
+class ContentProvider(object):
+    def __init__(self):
+        self.msg_queue = deque()
+        self.index = ContentIndex()
+        self.subscriptions = {}
+        self._subscribers = {}
+        self._next_id = 0
+
+    def notify(self, msg):
+        self.msg_queue.append(msg)
+
+    @staticmethod
+    def _key(content_filter, subscriber):
+        return id(subscriber), frozenset(content_filter.items())
+
+    def subscribe(self, content_filter, subscriber):
+        key = self._key(content_filter, subscriber)
+        if key in self.subscriptions:
+            return
+        sid = self._next_id
+        self._next_id += 1
+        self.index.add(sid, parse(content_filter))
+        self.subscriptions[key] = sid
+        self._subscribers[sid] = subscriber
+
+    def unsubscribe(self, content_filter, subscriber):
+        sid = self.subscriptions.pop(self._key(content_filter, subscriber))
+        self.index.remove(sid)
+        del self._subscribers[sid]
+
+    def match(self, msg):
+        seen = set()
+        subscribers = []
+        for sid in self.index.match(msg):
+            sub = self._subscribers[sid]
+            if id(sub) not in seen:
+                seen.add(id(sub))
+                subscribers.append(sub)
+        return subscribers
+
+    def update(self):
+        queue = self.msg_queue
+        while queue:
+            msg = queue.popleft()
+            for sub in self.match(msg):
+                sub.run(msg)
+
+
+class ContentPublisher:
+    def __init__(self, msg_center):
+        self.provider = msg_center
+
+    def publish(self, **fields):
+        self.provider.notify(fields)
+
+
+class ContentSubscriber(Subscriber):
+    def run(self, msg):
+        print("{} got {}".format(self.name, ", ".join("{}={}".format(k, msg[k]) for k in sorted(msg))))
+
+
+def main():
+    message_center = ContentProvider()
+
+    orders = ContentPublisher(message_center)
+
+    jim = ContentSubscriber("jim", message_center)
+    jim.subscribe({"region": "eu", "size >": 100})
+    jack = ContentSubscriber("jack", message_center)
+    jack.subscribe({"size <=": 10})
+    gee = ContentSubscriber("gee", message_center)
+    gee.subscribe({"region": "us"})
+    gee.subscribe({"region": "eu", "size >=": 500})
+
+    orders.publish(region="eu", size=150)
+    orders.publish(region="eu", size=5)
+    orders.publish(region="us", size=1000)
+    orders.publish(region="eu", size=500)
+    orders.publish(region="asia", size=50)
+
+    message_center.update()
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got region=eu, size=150
+jack got region=eu, size=5
+gee got region=us, size=1000
+jim got region=eu, size=500
+gee got region=eu, size=500
+"""
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publish/subscribe backed by a durable, append-only message log.
+
+LogProvider writes every published message to a SegmentedLog on local
+disk and keeps only the log offsets in memory, so a backlog costs a few
+bytes per message and survives a crash of the process: a new LogProvider
+opened on the same directory picks up where the last one stopped.
+
+The log is split into segments. Each segment is a pair of preallocated,
+memory-mapped files named after the offset of their first message:
+    00000000000000000000.log    the message payloads, back to back
+    00000000000000000000.index  a record count followed by one fixed-width
+                                (position, length) entry per message
+The record count is written last, so a message only exists once it is
+completely in the log. The next offset each consumer has to read is kept
+in a fixed-width <consumer>.offset file, also memory-mapped.
+
+Writes to a memory map survive the crash of the process; call flush() to
+also push them to the disk.
+"""
+
+from __future__ import print_function
+
+import bisect
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+
+
+def _map(path, size):
+    with open(path, 'a+b') as f:
+        if os.fstat(f.fileno()).st_size < size:
+            f.truncate(size)
+    with open(path, 'r+b') as f:
+        return mmap.mmap(f.fileno(), size)
+
+
+class Segment(object):
+    COUNT = struct.Struct('>Q')
+    ENTRY = struct.Struct('>II')
+
+    def __init__(self, directory, base, size, max_records):
+        self.base = base
+        self.size = size
+        self.max_records = max_records
+        name = os.path.join(directory, '{:020d}'.format(base))
+        self.data = _map(name + '.log', size)
+        self.index = _map(name + '.index', self.COUNT.size + max_records * self.ENTRY.size)
+        self.count = self.COUNT.unpack_from(self.index, 0)[0]
+        if self.count:
+            position, length = self._entry(self.count - 1)
+            self.end = position + length
+        else:
+            self.end = 0
+
+    def _entry(self, i):
+        return self.ENTRY.unpack_from(self.index, self.COUNT.size + i * self.ENTRY.size)
+
+    def fits(self, length):
+        return self.count < self.max_records and self.end + length <= self.size
+
+    def append(self, payload):
+        position = self.end
+        self.data[position:position + len(payload)] = payload
+        self.ENTRY.pack_into(self.index, self.COUNT.size + self.count * self.ENTRY.size, position, len(payload))
+        self.count += 1
+        self.end += len(payload)
+        self.COUNT.pack_into(self.index, 0, self.count)
+        return self.base + self.count - 1
+
+    def read(self, offset):
+        position, length = self._entry(offset - self.base)
+        return self.data[position:position + length]
+
+    def flush(self):
+        self.data.flush()
+        self.index.flush()
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+class SegmentedLog(object):
+    OFFSET = struct.Struct('>Q')
+
+    def __init__(self, directory, segment_size=1 << 20, max_records=1 << 14):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_records = max_records
+        bases = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith('.log'))
+        self.segments = [Segment(directory, base, segment_size, max_records) for base in bases or [0]]
+        self.bases = [segment.base for segment in self.segments]
+        self.consumers = {}
+
+    @property
+    def next_offset(self):
+        last = self.segments[-1]
+        return last.base + last.count
+
+    def append(self, payload):
+        if len(payload) > self.segment_size:
+            raise ValueError('message of {} bytes does not fit in a segment'.format(len(payload)))
+        if not self.segments[-1].fits(len(payload)):
+            segment = Segment(self.directory, self.next_offset, self.segment_size, self.max_records)
+            self.segments.append(segment)
+            self.bases.append(segment.base)
+        return self.segments[-1].append(payload)
+
+    def read(self, offset):
+        if not 0 <= offset < self.next_offset:
+            raise IndexError('offset {} is not in the log'.format(offset))
+        return self.segments[bisect.bisect_right(self.bases, offset) - 1].read(offset)
+
+    def _consumer(self, name):
+        try:
+            return self.consumers[name]
+        except KeyError:
+            path = os.path.join(self.directory, name + '.offset')
+            mapped = self.consumers[name] = _map(path, self.OFFSET.size)
+            return mapped
+
+    def committed(self, consumer):
+        """Return the next offset ``consumer`` has to read."""
+        return self.OFFSET.unpack_from(self._consumer(consumer), 0)[0]
+
+    def commit(self, consumer, offset):
+        self.OFFSET.pack_into(self._consumer(consumer), 0, offset)
+
+    def flush(self):
+        for segment in self.segments:
+            segment.flush()
+        for mapped in self.consumers.values():
+            mapped.flush()
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        for mapped in self.consumers.values():
+            mapped.close()
+        self.consumers = {}
+
+
+class LogProvider(Provider):
+    encoding = 'utf-8'
+
+    def __init__(self, directory, consumer='provider', **log_options):
+        Provider.__init__(self)
+        self.log = SegmentedLog(directory, **log_options)
+        self.consumer = consumer
+        # the messages left over by the previous run are still to be delivered
+        self.msg_queue.extend(range(self.log.committed(consumer), self.log.next_offset))
+
+    def encode(self, msg):
+        return msg.encode(self.encoding)
+
+    def decode(self, payload):
+        return payload.decode(self.encoding)
+
+    def notify(self, msg):
+        self.msg_queue.append(self.log.append(self.encode(msg)))
+
+    def update(self):
+        queue = self.msg_queue
+        while queue:
+            offset = queue.popleft()
+            msg = self.decode(self.log.read(offset))
+            for sub in self.match(msg):
+                sub.run(msg)
+            self.log.commit(self.consumer, offset + 1)
+
+    def replay(self, subscriber, offset, end=None):
+        """Run ``subscriber`` again on its messages from ``offset`` on."""
+        for offset in range(offset, self.log.next_offset if end is None else end):
+            msg = self.decode(self.log.read(offset))
+            if subscriber in self.match(msg):
+                subscriber.run(msg)
+
+    def close(self):
+        self.log.close()
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        message_center = LogProvider(directory)
+        fftv = Publisher(message_center)
+        jim = Subscriber("jim", message_center)
+        jim.subscribe("cartoon")
+
+        fftv.publish("cartoon")
+        message_center.update()
+        fftv.publish("cartoon")
+        fftv.publish("music")
+        # the process goes away before delivering the last two messages
+        message_center.close()
+
+        message_center = LogProvider(directory)
+        jim = Subscriber("jim", message_center)
+        jim.subscribe("cartoon")
+        print("recovered {} messages".format(len(message_center.msg_queue)))
+        message_center.update()
+        print("replay from offset 0")
+        message_center.replay(jim, 0)
+        message_center.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got cartoon
+recovered 2 messages
+jim got cartoon
+replay from offset 0
+jim got cartoon
+jim got cartoon
+"""
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publish/subscribe that keeps slow subscribers from holding up the others.
+
+MonitoredProvider times every Subscriber.run() call of update() and keeps
+a moving average per subscriber. A subscriber whose average exceeds the
+threshold is slow, and what happens to the messages it would get then
+depends on the policy:
+    SKIP        they are dropped; a slow subscriber still gets the first
+                message of every update(), to find out if it recovered
+    BUFFER      up to ``backlog`` of them wait (dropping the oldest) and
+                are delivered at the end of update(), after everybody else
+    DISCONNECT  the subscriber is unsubscribed from all its topics
+metrics() takes a snapshot of the numbers of every subscriber.
+"""
+
+from __future__ import print_function
+
+import time
+import weakref
+from collections import OrderedDict, deque
+
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+
+SKIP = 'skip'
+BUFFER = 'buffer'
+DISCONNECT = 'disconnect'
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+class _Consumer(object):
+    """Timings and backlog of one subscriber."""
+
+    # weight of the latest run() in the moving average
+    SMOOTHING = 0.2
+
+    def __init__(self, subscriber, backlog):
+        self.ref = weakref.ref(subscriber)
+        self.name = getattr(subscriber, 'name', repr(subscriber))
+        self.backlog = deque(maxlen=backlog)
+        self.delivered = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.busy = 0.0
+        self.average = None
+        self.slow = False
+        self.disconnected = False
+        self.probed = False
+
+    def timed_run(self, subscriber, msg, threshold):
+        started = _timer()
+        try:
+            subscriber.run(msg)
+        finally:
+            elapsed = _timer() - started
+            self.delivered += 1
+            self.busy += elapsed
+            if self.average is None:
+                self.average = elapsed
+            else:
+                self.average += self.SMOOTHING * (elapsed - self.average)
+            self.slow = self.average > threshold
+
+    def park(self, msg):
+        if len(self.backlog) == self.backlog.maxlen:
+            self.dropped += 1
+        self.backlog.append(msg)
+
+
+class MonitoredProvider(Provider):
+    def __init__(self, threshold=0.01, policy=SKIP, backlog=1000):
+        if policy not in (SKIP, BUFFER, DISCONNECT):
+            raise ValueError('unknown policy: {!r}'.format(policy))
+        Provider.__init__(self)
+        self.threshold = threshold
+        self.policy = policy
+        self.backlog = backlog
+        # id(subscriber) -> _Consumer
+        self.consumers = OrderedDict()
+
+    def _consumer(self, subscriber):
+        consumer = self.consumers.get(id(subscriber))
+        if consumer is None or consumer.ref() is not subscriber:
+            consumer = self.consumers[id(subscriber)] = _Consumer(subscriber, self.backlog)
+        return consumer
+
+    def subscribe(self, msg, subscriber):
+        self._consumer(subscriber).disconnected = False
+        return Provider.subscribe(self, msg, subscriber)
+
+    def disconnect(self, subscriber):
+        """Unsubscribe ``subscriber`` from every topic."""
+        key = id(subscriber)
+        for topic, registry in list(self.subscribers.items()):
+            if key in registry:
+                self._discard(topic, key)
+        consumer = self._consumer(subscriber)
+        consumer.disconnected = True
+        consumer.backlog.clear()
+
+    def update(self):
+        self._expire_timers()
+        for consumer in self.consumers.values():
+            consumer.probed = False
+        queue = self.msg_queue
+        while queue:
+            msg = queue.popleft()
+            for ref in self._resolve(msg):
+                sub = ref()
+                if sub is None:
+                    continue
+                consumer = self._consumer(sub)
+                if consumer.disconnected:
+                    continue
+                if not consumer.slow or (self.policy == SKIP and not consumer.probed):
+                    consumer.probed = True
+                    consumer.timed_run(sub, msg, self.threshold)
+                elif self.policy == BUFFER:
+                    consumer.park(msg)
+                else:
+                    consumer.skipped += 1
+                if consumer.slow and self.policy == DISCONNECT:
+                    self.disconnect(sub)
+        self._drain_backlogs()
+
+    def _drain_backlogs(self):
+        for consumer in list(self.consumers.values()):
+            sub = consumer.ref()
+            while consumer.backlog and sub is not None:
+                consumer.timed_run(sub, consumer.backlog.popleft(), self.threshold)
+
+    def metrics(self):
+        """Return a snapshot of the numbers of every known subscriber."""
+        snapshot = []
+        for key, consumer in list(self.consumers.items()):
+            if consumer.ref() is None:
+                del self.consumers[key]
+                continue
+            snapshot.append({
+                'subscriber': consumer.name,
+                'delivered': consumer.delivered,
+                'skipped': consumer.skipped,
+                'dropped': consumer.dropped,
+                'queued': len(consumer.backlog),
+                'average_run_s': consumer.average or 0.0,
+                'msgs_per_sec': consumer.delivered / consumer.busy if consumer.busy else 0.0,
+                'slow': consumer.slow,
+                'disconnected': consumer.disconnected,
+            })
+        return snapshot
+
+
+class SlowSubscriber(Subscriber):
+    def __init__(self, name, msg_center, delay):
+        Subscriber.__init__(self, name, msg_center)
+        self.delay = delay
+
+    def run(self, msg):
+        time.sleep(self.delay)
+        Subscriber.run(self, msg)
+
+
+def main():
+    message_center = MonitoredProvider(threshold=0.01, policy=BUFFER, backlog=2)
+
+    fftv = Publisher(message_center)
+
+    jim = Subscriber("jim", message_center)
+    jim.subscribe("cartoon.*")
+    gee = SlowSubscriber("gee", message_center, delay=0.03)
+    gee.subscribe("cartoon.*")
+
+    for episode in range(1, 5):
+        fftv.publish("cartoon.{}".format(episode))
+
+    message_center.update()
+
+    for metrics in message_center.metrics():
+        print("{subscriber}: delivered {delivered}, dropped {dropped}, queued {queued}, slow {slow}".format(**metrics))
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got cartoon.1
+gee got cartoon.1
+jim got cartoon.2
+jim got cartoon.3
+jim got cartoon.4
+gee got cartoon.3
+gee got cartoon.4
+jim: delivered 4, dropped 0, queued 0, slow False
+gee: delivered 3, dropped 1, queued 0, slow True
+"""
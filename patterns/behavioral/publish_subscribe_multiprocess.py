@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publish/subscribe with the deliveries spread over worker processes.
+
+ProcessProvider is a drop-in replacement for Provider: publishers and
+subscribers use it exactly the same way, only Subscriber.run() is executed
+in one of the worker processes instead of the caller's.
+
+Every topic is assigned to one worker by a stable hash of its name, so
+the messages of a topic are always delivered by the same process in the
+order they were published, while different topics run in parallel.
+A subscriber is pickled and sent to a worker the first time that worker
+needs it; each worker therefore keeps its own copy of the subscriber.
+
+A subscriber that raises, SystemExit included, only counts as an error of
+its worker. A worker process that dies nevertheless makes update() raise
+RuntimeError instead of waiting for it forever; the remaining workers are
+stopped and the next update() starts a new pool.
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import sys
+import time
+import weakref
+import zlib
+
+try:
+    import queue
+except ImportError:  # python 2.x compatibility
+    import Queue as queue
+
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+
+
+def _work(index, inbox, outbox):
+    subscribers = {}
+    for command, payload in iter(inbox.get, None):
+        if command == 'subscribe':
+            key, subscriber = payload
+            subscribers[key] = subscriber
+        elif command == 'forget':
+            subscribers.pop(payload, None)
+        elif command == 'deliver':
+            errors = 0
+            started = time.time()
+            for key, msg in payload:
+                try:
+                    subscribers[key].run(msg)
+                except BaseException:
+                    # SystemExit too, it must not take the worker down
+                    errors += 1
+            elapsed = time.time() - started
+            sys.stdout.flush()
+            outbox.put((index, len(payload), errors, elapsed))
+
+
+class _Worker(object):
+    def __init__(self, index, outbox):
+        self.inbox = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_work, args=(index, self.inbox, outbox))
+        self.process.daemon = True
+        self.process.start()
+        self.shipped = set()
+        self.delivered = 0
+        self.errors = 0
+        self.busy = 0.0
+
+
+class ProcessProvider(Provider):
+    # how often update() checks that its busy workers are still alive
+    LIVENESS_INTERVAL = 0.5
+
+    def __init__(self, workers=2):
+        Provider.__init__(self)
+        self.workers = workers
+        self._pool = None
+        self._outbox = None
+        self._shipped = {}
+        # (id, weak reference) of shipped subscribers that were collected
+        self._collected = []
+
+    def __getstate__(self):
+        # subscribers shipped to a worker take a detached provider along
+        return {'workers': self.workers}
+
+    def __setstate__(self, state):
+        self.__init__(state['workers'])
+
+    def shard(self, topic):
+        return zlib.crc32(topic.encode('utf-8')) % self.workers
+
+    def unsubscribe(self, msg, subscriber):
+        Provider.unsubscribe(self, msg, subscriber)
+        self._forget(id(subscriber))
+
+    def _ship(self, worker, sub):
+        key = id(sub)
+        if key not in self._shipped:
+            collected = self._collected
+            # may run in the middle of anything, so only take note here;
+            # update() has the workers drop their copy before shipping again
+            self._shipped[key] = weakref.ref(sub, lambda ref: collected.append((key, ref)))
+        worker.shipped.add(key)
+        worker.inbox.put(('subscribe', (key, sub)))
+
+    def _forget(self, key):
+        self._shipped.pop(key, None)
+        for worker in self._pool or ():
+            if key in worker.shipped:
+                worker.shipped.discard(key)
+                worker.inbox.put(('forget', key))
+
+    def _forget_collected(self):
+        while self._collected:
+            key, ref = self._collected.pop()
+            if self._shipped.get(key) is ref:
+                self._forget(key)
+
+    def update(self):
+        self._forget_collected()
+        self._expire_timers()
+        if self._pool is None:
+            self._outbox = multiprocessing.Queue()
+            self._pool = [_Worker(index, self._outbox) for index in range(self.workers)]
+        work = [[] for _ in self._pool]
+        msg_queue = self.msg_queue
+        while msg_queue:
+            msg = msg_queue.popleft()
+            index = self.shard(msg)
+            worker = self._pool[index]
+            for sub in self.match(msg):
+                if id(sub) not in worker.shipped:
+                    self._ship(worker, sub)
+                work[index].append((id(sub), msg))
+        busy = [index for index, pairs in enumerate(work) if pairs]
+        for index in busy:
+            self._pool[index].inbox.put(('deliver', work[index]))
+        pending = set(busy)
+        while pending:
+            try:
+                index, delivered, errors, elapsed = self._outbox.get(timeout=self.LIVENESS_INTERVAL)
+            except queue.Empty:
+                dead = sorted(index for index in pending if not self._pool[index].process.is_alive())
+                if dead:
+                    self._terminate()
+                    raise RuntimeError('worker {} died while delivering'.format(', '.join(map(str, dead))))
+                continue
+            pending.discard(index)
+            worker = self._pool[index]
+            worker.delivered += delivered
+            worker.errors += errors
+            worker.busy += elapsed
+
+    def worker_stats(self):
+        return [
+            {
+                'worker': index,
+                'pid': worker.process.pid,
+                'delivered': worker.delivered,
+                'errors': worker.errors,
+                'busy': worker.busy,
+                'throughput': worker.delivered / worker.busy if worker.busy else 0.0,
+            }
+            for index, worker in enumerate(self._pool or ())
+        ]
+
+    def close(self):
+        for worker in self._pool or ():
+            worker.inbox.put(None)
+        for worker in self._pool or ():
+            worker.process.join()
+        self._pool = None
+
+    def _terminate(self):
+        for worker in self._pool:
+            worker.process.terminate()
+            worker.process.join()
+        self._pool = self._outbox = None
+
+
+def main():
+    message_center = ProcessProvider(workers=2)
+
+    fftv = Publisher(message_center)
+
+    jim = Subscriber("jim", message_center)
+    jim.subscribe("cartoon")
+    gee = Subscriber("gee", message_center)
+    gee.subscribe("music")
+
+    fftv.publish("cartoon")
+    fftv.publish("music")
+    fftv.publish("cartoon")
+    fftv.publish("music")
+
+    message_center.update()
+    for stats in message_center.worker_stats():
+        print("worker {} delivered {}".format(stats['worker'], stats['delivered']))
+    message_center.close()
+
+
+if __name__ == "__main__":
+    main()
+
+
+### OUTPUT ###
+# (the lines of the two workers may interleave differently)
+# gee got music
+# gee got music
+# jim got cartoon
+# jim got cartoon
+# worker 0 delivered 2
+# worker 1 delivered 2
@@ -4,28 +4,321 @@
 Reference:
 http://www.slideshare.net/ishraqabd/publish-subscribe-model-overview-13368808
 Author: https://github.com/HanWenfang
+
+Subscriptions are keyed by publisher name, which makes it a natural
+partition key: PartitionedProvider hashes every publisher to one of its
+partitions, each drained by its own worker thread. Messages of one
+publisher are delivered in order by one thread, while different
+publishers are delivered in parallel. Delivery starts as soon as a message
+is published; update() waits until every partition has caught up.
+
+Queued messages can be kept as packed records instead of Python objects:
+a RecordQueue packs every (pub_name, msg) with the struct layout of a
+Schema into one preallocated bytearray and keeps only the offsets of the
+oldest and newest record, turning each message back into a namedtuple
+when it is delivered.
+
+A ConsumerGroup subscribes like a single subscriber but shares the
+messages among its members instead of giving every member every message.
+Each member runs on a worker thread of its own, and every message goes to
+the next member in turn (ROUND_ROBIN) or to the one with the fewest
+messages waiting (LEAST_LOADED). Given a ``key`` function, messages of the
+same key go to the member that still has messages of that key waiting,
+so they are run in order as long as the members of the group stay the
+same.
 """
 
+import struct
+import threading
+import zlib
+from collections import deque, namedtuple
+
+try:
+    import queue
+except ImportError:  # python 2.x compatibility
+    import Queue as queue
+
+
+class Schema(object):
+    """Field names and struct formats of a message, e.g.
+    Schema('Tick', [('price', 'd'), ('size', 'I')])."""
+
+    def __init__(self, name, fields):
+        self.record = namedtuple(name, [field for field, _ in fields])
+        self.format = ''.join(fmt for _, fmt in fields)
+
+
+class RecordQueue(object):
+    """FIFO of (pub_name, msg) packed into a ring of fixed-size records."""
+
+    def __init__(self, schema, capacity=1024):
+        self.schema = schema
+        # every record starts with the number of its publisher
+        self._struct = struct.Struct('<H' + schema.format)
+        self._arena = bytearray(capacity * self._struct.size)
+        self._capacity = capacity
+        self._head = 0
+        self._count = 0
+        self._publishers = []
+        self._publisher_ids = {}
+
+    def _grow(self):
+        size = self._struct.size
+        head = self._head * size
+        # unroll the ring so the records are in order from offset 0
+        arena = self._arena[head:] + self._arena[:head]
+        arena.extend(bytearray(len(arena)))
+        self._arena = arena
+        self._head = 0
+        self._capacity *= 2
+
+    def append(self, item):
+        pub_name, msg = item
+        try:
+            publisher = self._publisher_ids[pub_name]
+        except KeyError:
+            publisher = self._publisher_ids[pub_name] = len(self._publishers)
+            self._publishers.append(pub_name)
+        if isinstance(msg, dict):
+            msg = [msg[field] for field in self.schema.record._fields]
+        if self._count == self._capacity:
+            self._grow()
+        tail = (self._head + self._count) % self._capacity
+        self._struct.pack_into(self._arena, tail * self._struct.size, publisher, *msg)
+        self._count += 1
+
+    def popleft(self):
+        if not self._count:
+            raise IndexError('pop from an empty queue')
+        fields = self._struct.unpack_from(self._arena, self._head * self._struct.size)
+        self._head = (self._head + 1) % self._capacity
+        self._count -= 1
+        return self._publishers[fields[0]], self.schema.record(*fields[1:])
+
+    def drain(self):
+        """Pop every queued message at once."""
+        unpack_from, size, record = self._struct.unpack_from, self._struct.size, self.schema.record
+        publishers = self._publishers
+        items = []
+        for i in range(self._head, self._head + self._count):
+            fields = unpack_from(self._arena, (i % self._capacity) * size)
+            items.append((publishers[fields[0]], record(*fields[1:])))
+        self._head = self._count = 0
+        return items
+
+    def __len__(self):
+        return self._count
+
 
 class Provider:
-    def __init__(self):
-        self.msg_queue = []
+    def __init__(self, msg_queue=None):
+        self.msg_queue = deque() if msg_queue is None else msg_queue
+        # publisher -> tuple of subscribers, replaced on every change so
+        # a delivery in progress keeps iterating the tuple it started with
         self.subscribers = {}
 
     def notify(self, pub_name, msg):
         self.msg_queue.append((pub_name, msg))
 
     def subscribe(self, msg, subscriber):
-        self.subscribers.setdefault(msg, []).append(subscriber)
+        self.subscribers[msg] = self.subscribers.get(msg, ()) + (subscriber,)
 
     def unsubscribe(self, msg, subscriber):
-        self.subscribers[msg].remove(subscriber)
+        subscribers = list(self.subscribers[msg])
+        subscribers.remove(subscriber)
+        self.subscribers[msg] = tuple(subscribers)
 
     def update(self):
-        for pub_name, msg in self.msg_queue:
-            for sub in self.subscribers.get(pub_name, []):
+        queue = self.msg_queue
+        while queue:
+            pub_name, msg = queue.popleft()
+            for sub in self.subscribers.get(pub_name, ()):
                 sub.run(msg)
-        self.msg_queue = []
+
+
+class _Partition(object):
+    def __init__(self, provider):
+        self.provider = provider
+        self.queue = queue.Queue()
+        self.published = 0
+        self.delivered = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self._drain)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _drain(self):
+        for pub_name, msg in iter(self.queue.get, None):
+            for sub in self.provider.subscribers.get(pub_name, ()):
+                try:
+                    sub.run(msg)
+                except Exception:
+                    self.errors += 1
+            self.delivered += 1
+            self.queue.task_done()
+        self.queue.task_done()
+
+
+class PartitionedProvider(Provider):
+    def __init__(self, partitions=4):
+        Provider.__init__(self)
+        self.partitions = []
+        self.set_partitions(partitions)
+
+    def set_partitions(self, count):
+        """Drain the current partitions and continue with ``count`` new ones."""
+        if count < 1:
+            raise ValueError('a provider needs at least one partition, not {!r}'.format(count))
+        self.close()
+        self.partitions = [_Partition(self) for _ in range(count)]
+
+    def partition(self, pub_name):
+        return zlib.crc32(pub_name.encode('utf-8')) % len(self.partitions)
+
+    def notify(self, pub_name, msg):
+        partition = self.partitions[self.partition(pub_name)]
+        partition.published += 1
+        partition.queue.put((pub_name, msg))
+
+    def update(self):
+        for partition in self.partitions:
+            partition.queue.join()
+
+    def stats(self):
+        return [
+            {
+                'partition': index,
+                'published': partition.published,
+                'delivered': partition.delivered,
+                'errors': partition.errors,
+                'lag': partition.published - partition.delivered,
+            }
+            for index, partition in enumerate(self.partitions)
+        ]
+
+    def close(self):
+        for partition in self.partitions:
+            partition.queue.put(None)
+        for partition in self.partitions:
+            partition.thread.join()
+        self.partitions = []
+
+
+ROUND_ROBIN = 'round_robin'
+LEAST_LOADED = 'least_loaded'
+
+
+class _Member(object):
+    def __init__(self, subscriber, group):
+        self.subscriber = subscriber
+        self.group = group
+        self.queue = queue.Queue()
+        self.assigned = 0
+        self.delivered = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self._drain)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def waiting(self):
+        return self.assigned - self.delivered
+
+    def _drain(self):
+        for key, msg in iter(self.queue.get, None):
+            try:
+                self.subscriber.run(msg)
+            except Exception:
+                self.errors += 1
+            self.group._done(self, key)
+            self.queue.task_done()
+        self.queue.task_done()
+
+
+class ConsumerGroup(object):
+    def __init__(self, name, msg_center, strategy=ROUND_ROBIN, key=None):
+        if strategy not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError('unknown strategy: {!r}'.format(strategy))
+        self.sub_name = name
+        self.provider = msg_center
+        self.strategy = strategy
+        self.key = key
+        self.members = []
+        # key -> [member, messages of that key the member has not run yet]
+        self._owners = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def add(self, subscriber):
+        with self._lock:
+            self.members.append(_Member(subscriber, self))
+
+    def remove(self, subscriber):
+        """Take ``subscriber`` out of the group once it ran its messages."""
+        with self._lock:
+            member = next((member for member in self.members if member.subscriber is subscriber), None)
+            if member is None:
+                raise ValueError('{!r} is not a member of the group'.format(subscriber))
+            self.members.remove(member)
+        member.queue.put(None)
+        member.thread.join()
+
+    def subscribe(self, pub_name):
+        self.provider.subscribe(pub_name, self)
+
+    def unsubscribe(self, pub_name):
+        self.provider.unsubscribe(pub_name, self)
+
+    def _pick(self):
+        if self.strategy == LEAST_LOADED:
+            return min(self.members, key=lambda member: member.waiting)
+        self._next = (self._next + 1) % len(self.members)
+        return self.members[self._next - 1]
+
+    def run(self, msg):
+        key = None if self.key is None else self.key(msg)
+        with self._lock:
+            if not self.members:
+                raise LookupError('consumer group {} has no members'.format(self.sub_name))
+            owner = self._owners.get(key) if key is not None else None
+            if owner is None or owner[0] not in self.members:
+                owner = [self._pick(), 0]
+                if key is not None:
+                    self._owners[key] = owner
+            owner[1] += 1
+            member = owner[0]
+            member.assigned += 1
+        member.queue.put((key, msg))
+
+    def _done(self, member, key):
+        with self._lock:
+            member.delivered += 1
+            owner = self._owners.get(key)
+            if owner is not None and owner[0] is member:
+                owner[1] -= 1
+                if not owner[1]:
+                    del self._owners[key]
+
+    def wait(self):
+        """Wait until the members ran every message they got so far."""
+        for member in list(self.members):
+            member.queue.join()
+
+    def stats(self):
+        return [
+            {
+                'member': getattr(member.subscriber, 'sub_name', repr(member.subscriber)),
+                'assigned': member.assigned,
+                'delivered': member.delivered,
+                'errors': member.errors,
+                'waiting': member.waiting,
+            }
+            for member in list(self.members)
+        ]
+
+    def close(self):
+        for member in list(self.members):
+            self.remove(member.subscriber)
 
 
 class Publisher:
@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Message queues and timers for a publish_subscribe Provider.
+
+A Provider's msg_queue can be replaced by any object with append(),
+popleft() and len(), e.g. a PriorityQueue: then
+Publisher.publish(msg, priority=1, ttl=5) passes the extra options on to
+its append(). Messages that outlived their ttl are dropped before
+dispatch and counted in PriorityQueue.expired. A ConflatingQueue keeps
+only the latest undelivered message per key for the topics it conflates,
+so every update() delivers at most one message per key of such a topic,
+however fast it is published.
+
+Publishers that retry can pass a message id, publish(msg, msg_id=...), to
+a Provider whose msg_queue is a DedupQueue: a message whose id was already
+published within the window is dropped. The ids are kept in a bounded
+Deduplicator, optionally behind a Bloom filter, which counts how many ids
+it had to evict and how often the Bloom filter was wrong.
+
+Messages published with a delay or an interval wait in a hierarchical
+TimingWheel, which the Provider creates by itself for the first of them.
+"""
+
+from __future__ import print_function
+
+import hashlib
+import heapq
+import itertools
+import math
+import struct
+import time
+from collections import OrderedDict, deque
+
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber, TopicTrie
+
+
+class PriorityQueue(object):
+    """Message queue, highest priority first, that drops expired messages."""
+
+    def __init__(self, clock=getattr(time, 'monotonic', time.time)):
+        self.clock = clock
+        self.expired = 0
+        self._heap = []
+        self._order = itertools.count()
+
+    def append(self, msg, priority=0, ttl=None):
+        deadline = None if ttl is None else self.clock() + ttl
+        # the running order keeps equal priorities first in, first out
+        heapq.heappush(self._heap, (-priority, next(self._order), deadline, msg))
+
+    def _expire(self):
+        heap = self._heap
+        while heap and heap[0][2] is not None and heap[0][2] <= self.clock():
+            heapq.heappop(heap)
+            self.expired += 1
+
+    def popleft(self):
+        self._expire()
+        if not self._heap:
+            raise IndexError('pop from an empty queue')
+        return heapq.heappop(self._heap)[3]
+
+    def __len__(self):
+        # expired messages only count until they come up
+        self._expire()
+        return len(self._heap)
+
+
+class _Latest(object):
+    __slots__ = ('key', 'msg')
+
+    def __init__(self, key, msg):
+        self.key = key
+        self.msg = msg
+
+
+class ConflatingQueue(object):
+    """FIFO message queue where a newer message replaces an undelivered one
+    with the same key, for the topics passed to conflate()."""
+
+    # as Provider.MATCH_CACHE_SIZE, for the topics known to conflate or not
+    MATCH_CACHE_SIZE = 65536
+
+    def __init__(self, key=None):
+        self.key = key or (lambda msg: msg)
+        self.conflated = 0
+        self._topics = TopicTrie()
+        self._conflates = {}
+        self._queue = deque()
+        self._pending = {}
+
+    def conflate(self, pattern):
+        self._topics.insert(pattern)
+        self._conflates.clear()
+
+    def append(self, msg):
+        try:
+            conflates = self._conflates[msg]
+        except KeyError:
+            if len(self._conflates) >= self.MATCH_CACHE_SIZE:
+                self._conflates.clear()
+            conflates = self._conflates[msg] = bool(self._topics.match(msg))
+        if not conflates:
+            self._queue.append(msg)
+            return
+        key = self.key(msg)
+        latest = self._pending.get(key)
+        if latest is None:
+            latest = self._pending[key] = _Latest(key, msg)
+            self._queue.append(latest)
+        else:
+            # takes over the queue position of the message it replaces
+            latest.msg = msg
+            self.conflated += 1
+
+    def popleft(self):
+        entry = self._queue.popleft()
+        if type(entry) is _Latest:
+            del self._pending[entry.key]
+            return entry.msg
+        return entry
+
+    def __len__(self):
+        return len(self._queue)
+
+
+class BloomFilter(object):
+    """Set of keys that can answer "maybe present" for absent keys, at
+    about ``error_rate`` of the time, in a fixed number of bits."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / float(capacity) * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # k positions out of two hashes (Kirsch and Mitzenmacher)
+        first, second = struct.unpack('<QQ', hashlib.md5(repr(key).encode('utf-8')).digest())
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class Deduplicator(object):
+    """Remembers message ids for ``window`` seconds, at most ``max_ids`` of
+    them, the oldest being evicted first. With bloom=True, a Bloom filter
+    of the ids of the last one or two windows is asked first, and only
+    ids it may have seen are looked up in the exact set."""
+
+    def __init__(self, window=60.0, max_ids=100000, bloom=False, error_rate=0.01,
+                 clock=getattr(time, 'monotonic', time.time)):
+        self.window = window
+        self.max_ids = max_ids
+        self.clock = clock
+        self.error_rate = error_rate
+        # message id -> when it was first seen, oldest first
+        self._ids = OrderedDict()
+        self._blooms = None
+        if bloom:
+            self._blooms = [BloomFilter(max_ids, error_rate), BloomFilter(max_ids, error_rate)]
+            self._rotated = clock()
+        self.checked = 0
+        self.duplicates = 0
+        self.evicted = 0
+        self.bloom_hits = 0
+        self.false_positives = 0
+
+    def _expire(self, now):
+        ids = self._ids
+        while ids:
+            # next(iter(ids.items())) copies all items on Python 2
+            msg_id = next(iter(ids))
+            seen = ids[msg_id]
+            if now - seen < self.window:
+                break
+            del ids[msg_id]
+        if self._blooms is not None and now - self._rotated >= self.window:
+            self._blooms = [BloomFilter(self.max_ids, self.error_rate), self._blooms[0]]
+            self._rotated = now
+
+    def seen(self, msg_id):
+        """Return True if ``msg_id`` was seen within the window, else remember it."""
+        now = self.clock()
+        self._expire(now)
+        self.checked += 1
+        blooms = self._blooms
+        if blooms is None or msg_id in blooms[0] or msg_id in blooms[1]:
+            if blooms is not None:
+                self.bloom_hits += 1
+            if msg_id in self._ids:
+                self.duplicates += 1
+                return True
+            if blooms is not None:
+                # or an id that was evicted from the exact set
+                self.false_positives += 1
+        if len(self._ids) >= self.max_ids:
+            self._ids.popitem(last=False)
+            self.evicted += 1
+        self._ids[msg_id] = now
+        if blooms is not None:
+            blooms[0].add(msg_id)
+        return False
+
+    def stats(self):
+        remembered = self.checked - self.duplicates
+        return {
+            'checked': self.checked,
+            'duplicates': self.duplicates,
+            'remembered': len(self._ids),
+            'evicted': self.evicted,
+            'eviction_rate': self.evicted / float(remembered) if remembered else 0.0,
+            'false_positive_rate': self.false_positives / float(remembered) if remembered else 0.0,
+        }
+
+
+class DedupQueue(object):
+    """Message queue that drops messages whose msg_id was already published,
+    in front of another queue (a deque by default)."""
+
+    def __init__(self, dedup=None, msg_queue=None):
+        self.dedup = Deduplicator() if dedup is None else dedup
+        self._queue = deque() if msg_queue is None else msg_queue
+
+    def append(self, msg, msg_id=None, **options):
+        if msg_id is not None and self.dedup.seen(msg_id):
+            return
+        self._queue.append(msg, **options)
+
+    def popleft(self):
+        return self._queue.popleft()
+
+    def __len__(self):
+        return len(self._queue)
+
+
+class Timer(object):
+    """Handle of a scheduled message, cancel() keeps it from being published."""
+
+    __slots__ = ('msg', 'options', 'expires', 'interval', 'cancelled')
+
+    def __init__(self, msg, options, expires, interval):
+        self.msg = msg
+        self.options = options
+        self.expires = expires
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimingWheel(object):
+    """Hierarchical timing wheel of scheduled messages.
+
+    Every level is a ring of SLOTS lists, a slot of level n covering
+    SLOTS ** n ticks. A timer goes to the lowest level that reaches its
+    expiry, and whenever the level below completes a turn, the next slot
+    of a level is emptied into the levels below it. Scheduling and
+    cancelling are O(1), every timer moves down at most LEVELS times.
+    """
+
+    SLOTS = 256
+    LEVELS = 4
+
+    def __init__(self, tick=0.001, clock=getattr(time, 'monotonic', time.time)):
+        self.tick = tick
+        self.clock = clock
+        self._now = int(clock() / tick)
+        self._wheels = [[[] for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+        self._due = []
+        self._count = 0
+
+    def schedule(self, msg, delay=0, interval=None, **options):
+        """Publish ``msg`` in ``delay`` seconds, then every ``interval`` seconds."""
+        ticks = None if interval is None else max(1, int(round(interval / self.tick)))
+        now = self.clock()
+        if delay > 0:
+            # the deadline is rounded up, a message never goes out early;
+            # rounded first so that e.g. 0.003 / 0.001 does not become 4 ticks
+            expires = int(math.ceil(round((now + delay) / self.tick, 6)))
+        else:
+            expires = int(now / self.tick)
+        timer = Timer(msg, options, expires, ticks)
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer):
+        self._count += 1
+        delta = timer.expires - self._now
+        if delta <= 0:
+            self._due.append(timer)
+            return
+        level = 0
+        span = self.SLOTS
+        while delta >= span and level < self.LEVELS - 1:
+            level += 1
+            span *= self.SLOTS
+        # beyond the last level, the timer goes round the top level until due
+        slot = (timer.expires // (span // self.SLOTS)) % self.SLOTS
+        self._wheels[level][slot].append(timer)
+
+    def _cascade(self, level):
+        index = (self._now // self.SLOTS ** level) % self.SLOTS
+        timers = self._wheels[level][index]
+        self._wheels[level][index] = []
+        self._count -= len(timers)
+        for timer in timers:
+            self._insert(timer)
+
+    def expire(self):
+        """Return the timers that are due, periodic ones scheduled again."""
+        target = int(self.clock() / self.tick)
+        due, self._due = self._due, []
+        wheel = self._wheels[0]
+        while self._now < target:
+            if not self._count - len(due):
+                self._now = target
+                break
+            self._now += 1
+            # levels complete their turns together, the highest one first
+            level = 0
+            while level < self.LEVELS - 1 and not (self._now // self.SLOTS ** level) % self.SLOTS:
+                level += 1
+            for upper in range(level, 0, -1):
+                self._cascade(upper)
+            slot = self._now % self.SLOTS
+            if wheel[slot]:
+                due.extend(wheel[slot])
+                wheel[slot] = []
+            due.extend(self._due)
+            self._due = []
+        self._count -= len(due)
+        fired = []
+        for timer in due:
+            if timer.cancelled:
+                continue
+            fired.append(timer)
+            if timer.interval is not None:
+                timer.expires += timer.interval
+                self._insert(timer)
+        return fired
+
+    def next_expiry(self):
+        """Return the seconds until expire() may have something to do, None
+        if no timer is scheduled.
+
+        That is when the earliest timer of the lowest level is due, or
+        when an upper level slot is emptied into the levels below it,
+        whichever comes first, so the answer is never late."""
+        if not self._count:
+            return None
+        if self._due:
+            return 0.0
+        earliest = None
+        for level, wheel in enumerate(self._wheels):
+            span = self.SLOTS ** level
+            start = self._now // span
+            for ahead in range(1, self.SLOTS + 1):
+                if wheel[(start + ahead) % self.SLOTS]:
+                    tick = (start + ahead) * span
+                    if earliest is None or tick < earliest:
+                        earliest = tick
+                    break
+        return max(0.0, earliest * self.tick - self.clock())
+
+    def __len__(self):
+        """Number of scheduled timers, cancelled ones until they come up."""
+        return self._count
+
+
+def main():
+    message_center = Provider(msg_queue=DedupQueue(msg_queue=PriorityQueue()))
+
+    fftv = Publisher(message_center)
+
+    jim = Subscriber("jim", message_center)
+    jim.subscribe("#")
+
+    fftv.publish("cartoon")
+    fftv.publish("news", priority=1, msg_id=1)
+    fftv.publish("news", priority=1, msg_id=1)
+    fftv.publish("movie", msg_id=2)
+
+    message_center.update()
+    print("{} duplicate dropped".format(message_center.msg_queue.dedup.duplicates))
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got news
+jim got cartoon
+jim got movie
+1 duplicate dropped
+"""
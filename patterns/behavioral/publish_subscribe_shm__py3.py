@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publish/subscribe of large payloads through shared memory.
+
+A SharedRing is a ring of fixed-size slots in one
+multiprocessing.shared_memory block. SharedPublisher writes every payload
+once into the next slot and publishes only a small SlotRef through an
+ordinary publish_subscribe_pro.Provider. ReaderProxy subscribers forward
+the SlotRef over a pipe to a SharedSubscriber in another process, which
+hands its run() a zero-copy memoryview of the slot.
+
+Every slot header holds one flag byte per reader. The publisher raises the
+flags of all readers a payload is meant for, and each reader clears only
+its own flag once it is done, so the number of raised flags is the
+reference count of the slot. A slot is reused once it drops to zero;
+until then the publisher waits for it.
+
+multiprocessing.shared_memory only exists from Python 3.8 on; before
+that, the module still imports but SharedRing() raises RuntimeError.
+"""
+
+import collections
+import multiprocessing
+import struct
+import time
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python 3.7 and older
+    shared_memory = None
+
+from patterns.behavioral.publish_subscribe_pro import Provider
+
+SlotRef = collections.namedtuple('SlotRef', 'slot sequence length')
+
+
+class RingFull(Exception):
+    pass
+
+
+class SharedRing(object):
+    HEADER = struct.Struct('>QQ')
+
+    def __init__(self, name=None, slots=8, slot_size=1 << 20, max_readers=8):
+        if shared_memory is None:
+            raise RuntimeError('SharedRing requires python 3.8 or higher')
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_readers = max_readers
+        self.header_size = self.HEADER.size + max_readers
+        size = slots * (self.header_size + slot_size)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.next_slot = 0
+        self.sequence = 0
+
+    def attach(self):
+        """Return the arguments that open this ring in another process."""
+        return {'name': self.name, 'slots': self.slots, 'slot_size': self.slot_size, 'max_readers': self.max_readers}
+
+    def _header(self, slot):
+        return slot * self.header_size
+
+    def _data(self, slot):
+        return self.slots * self.header_size + slot * self.slot_size
+
+    def refcount(self, slot):
+        flags = self._header(slot) + self.HEADER.size
+        return sum(self.memory.buf[flags:flags + self.max_readers])
+
+    def put(self, payload, readers, timeout=5.0):
+        """Copy ``payload`` into the next slot for ``readers`` and return its SlotRef."""
+        if len(payload) > self.slot_size:
+            raise ValueError('payload of {} bytes does not fit in a slot'.format(len(payload)))
+        slot = self.next_slot
+        deadline = time.time() + timeout
+        while self.refcount(slot):
+            if time.time() > deadline:
+                raise RingFull('slot {} is still in use'.format(slot))
+            time.sleep(0.0005)
+        self.next_slot = (slot + 1) % self.slots
+        self.sequence += 1
+        buf = self.memory.buf
+        data = self._data(slot)
+        buf[data:data + len(payload)] = payload
+        header = self._header(slot)
+        self.HEADER.pack_into(buf, header, len(payload), self.sequence)
+        for reader in readers:
+            buf[header + self.HEADER.size + reader] = 1
+        return SlotRef(slot, self.sequence, len(payload))
+
+    def view(self, ref):
+        """Return a read-only memoryview of the payload behind ``ref``."""
+        length, sequence = self.HEADER.unpack_from(self.memory.buf, self._header(ref.slot))
+        if sequence != ref.sequence:
+            raise LookupError('slot {} was reused'.format(ref.slot))
+        data = self._data(ref.slot)
+        return self.memory.buf[data:data + length].toreadonly()
+
+    def release(self, ref, reader):
+        self.memory.buf[self._header(ref.slot) + self.HEADER.size + reader] = 0
+
+    def close(self):
+        """Detach from the ring; every memoryview has to be released first."""
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+class ReaderProxy(object):
+    """Stands in the Provider for a SharedSubscriber of another process."""
+
+    def __init__(self, reader, connection):
+        self.reader = reader
+        self.connection = connection
+
+    def run(self, ref):
+        self.connection.send(ref)
+
+    def close(self):
+        self.connection.send(None)
+        self.connection.close()
+
+
+class SharedPublisher(object):
+    def __init__(self, name, msg_center, ring):
+        self.name = name
+        self.provider = msg_center
+        self.ring = ring
+
+    def publish(self, payload):
+        readers = [sub.reader for sub in self.provider.subscribers.get(self.name, ())]
+        self.provider.notify(self.name, self.ring.put(payload, readers))
+
+
+class SharedSubscriber(object):
+    def __init__(self, sub_name, ring, reader, connection):
+        self.sub_name = sub_name
+        self.ring = ring
+        self.reader = reader
+        self.connection = connection
+
+    def poll(self, timeout=None):
+        """Run the next payload; returns False once the publisher is gone."""
+        if not self.connection.poll(timeout):
+            return True
+        try:
+            ref = self.connection.recv()
+        except EOFError:
+            ref = None
+        if ref is None:
+            return False
+        view = self.ring.view(ref)
+        try:
+            self.run(view)
+        finally:
+            view.release()
+            self.ring.release(ref, self.reader)
+        return True
+
+    def run(self, view):
+        print("{} got {} bytes starting with {}".format(self.sub_name, len(view), bytes(view[:4])))
+
+
+def _subscriber_process(sub_name, ring_args, reader, connection):
+    ring = SharedRing(**ring_args)
+    sub = SharedSubscriber(sub_name, ring, reader, connection)
+    while sub.poll():
+        pass
+    ring.close()
+
+
+def main():
+    ring = SharedRing(slots=2, slot_size=1 << 20)
+    try:
+        message_center = Provider()
+        ours, theirs = multiprocessing.Pipe()
+        proxy = ReaderProxy(0, ours)
+        message_center.subscribe("camera", proxy)
+        jim = multiprocessing.Process(target=_subscriber_process, args=("jim", ring.attach(), 0, theirs))
+        jim.start()
+        theirs.close()
+
+        camera = SharedPublisher("camera", message_center, ring)
+        # the third frame waits until jim is done with the first one
+        for frame in (b"IMG1", b"IMG2", b"IMG3"):
+            camera.publish(frame * (1 << 18))
+            message_center.update()
+
+        proxy.close()
+        jim.join()
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got 1048576 bytes starting with b'IMG1'
+jim got 1048576 bytes starting with b'IMG2'
+jim got 1048576 bytes starting with b'IMG3'
+"""
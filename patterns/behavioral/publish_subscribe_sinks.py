@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Where a Subscriber writes the messages it got.
+
+A Subscriber with a sink calls sink.write(line) instead of print(). The
+sinks here keep the lines in a buffer and hand them on in one go once
+they add up to ``max_bytes`` or the oldest of them waited ``max_delay``
+seconds, so a million deliveries cost a few hundred writes:
+    TextSink    writes to a text stream, sys.stdout by default
+    BinarySink  writes UTF-8 encoded lines to a file opened in binary mode
+    MemorySink  keeps the lines in its ``collected`` list
+The delay is only checked when a line is written; flush() or close() (or
+leaving a ``with`` block) writes out whatever is left.
+"""
+
+from __future__ import print_function
+
+import io
+import sys
+import time
+
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+
+
+class BufferedSink(object):
+    def __init__(self, max_bytes=1 << 16, max_delay=0.5):
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._pending = []
+        self._size = 0
+        self._since = None
+        self.lines = 0
+        self.writes = 0
+
+    def write(self, line):
+        if not self._pending:
+            self._since = time.time()
+        self._pending.append(line)
+        self._size += len(line) + 1
+        self.lines += 1
+        if self._size >= self.max_bytes or time.time() - self._since >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            pending, self._pending, self._size = self._pending, [], 0
+            self._write(pending)
+            self.writes += 1
+
+    def _write(self, lines):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TextSink(BufferedSink):
+    def __init__(self, stream=None, **thresholds):
+        BufferedSink.__init__(self, **thresholds)
+        self.stream = stream
+
+    def _write(self, lines):
+        # looked up late so that a redirected sys.stdout is honoured
+        stream = self.stream or sys.stdout
+        stream.write('\n'.join(lines) + '\n')
+        stream.flush()
+
+
+class BinarySink(BufferedSink):
+    def __init__(self, file, **thresholds):
+        BufferedSink.__init__(self, **thresholds)
+        self._owned = not hasattr(file, 'write')
+        # unbuffered: this class does the buffering
+        self.file = io.open(file, 'ab', buffering=0) if self._owned else file
+
+    def _write(self, lines):
+        self.file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+
+    def close(self):
+        BufferedSink.close(self)
+        if self._owned:
+            self.file.close()
+
+
+class MemorySink(BufferedSink):
+    def __init__(self, **thresholds):
+        BufferedSink.__init__(self, **thresholds)
+        self.collected = []
+
+    def _write(self, lines):
+        self.collected.extend(lines)
+
+
+def main():
+    message_center = Provider()
+
+    fftv = Publisher(message_center)
+
+    with TextSink() as screen:
+        jim = Subscriber("jim", message_center, sink=screen)
+        jim.subscribe("cartoon")
+        recorder = MemorySink(max_bytes=1024)
+        gee = Subscriber("gee", message_center, sink=recorder)
+        gee.subscribe("movie")
+
+        for _ in range(3):
+            fftv.publish("cartoon")
+        for _ in range(1000):
+            fftv.publish("movie")
+        message_center.update()
+        recorder.close()
+
+    print("gee recorded {} lines in {} writes".format(len(recorder.collected), recorder.writes))
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got cartoon
+jim got cartoon
+jim got cartoon
+gee recorded 1000 lines in 14 writes
+"""
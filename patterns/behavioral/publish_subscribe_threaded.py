@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publish/subscribe from many threads at once.
+
+ThreadedProvider can be published to from any number of threads and
+delivers on a dispatcher thread of its own, so nobody has to call update()
+to get messages delivered; update() only waits until everything published
+so far has been.
+
+Publishing takes no lock: every producing thread appends to a deque of its
+own, registered with the provider the first time the thread publishes,
+and the dispatcher empties those deques one after another into msg_queue
+before delivering it as Provider.update() does. The messages of one thread
+are delivered in the order that thread published them. A dispatcher that
+runs out of messages goes to sleep, and only then do producers pay for
+waking it up.
+
+Subscriptions may change from any thread too, they are guarded by a lock
+that the dispatcher only takes when a topic is not in the match cache.
+
+publish() checks its options on the publisher's thread, so a mistake
+raises there as with Provider. Messages published with a delay or an
+interval go to the timing wheel and the dispatcher delivers them once due.
+"""
+
+from __future__ import print_function
+
+import inspect
+import threading
+import time
+from collections import deque
+
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+
+
+def _accepted_options(append):
+    """Return the keyword arguments ``append`` takes after the message,
+    None if it takes any."""
+    try:
+        parameters = list(inspect.signature(append).parameters.values())
+    except AttributeError:  # Python 2
+        try:
+            spec = inspect.getargspec(append)
+        except TypeError:  # built-in
+            return frozenset()
+        return None if spec.keywords else frozenset(spec.args[2:])
+    except ValueError:  # built-in without a signature, e.g. deque.append
+        return frozenset()
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+        return None
+    keywords = (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+    return frozenset(parameter.name for parameter in parameters[1:] if parameter.kind in keywords)
+
+
+class _Producer(object):
+    __slots__ = ('thread', 'queue', 'sent', 'taken', 'delivered')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.queue = deque()
+        # sent is only written by the producing thread, the others only
+        # by the dispatcher
+        self.sent = 0
+        self.taken = 0
+        self.delivered = 0
+
+
+class ThreadedProvider(Provider):
+    # longest nap of an idle dispatcher, in seconds
+    IDLE_TIMEOUT = 0.5
+
+    def __init__(self, batch=False, msg_queue=None):
+        Provider.__init__(self, batch, msg_queue)
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        # replaced, never changed in place, so the dispatcher can iterate it
+        self._producers = ()
+        self._idle = False
+        self._wakeup = threading.Event()
+        self._drained = threading.Condition()
+        self._closed = False
+        # totals of the producers that were forgotten
+        self._retired = [0, 0]
+        self.errors = 0
+        self.rounds = 0
+        self._accepted = _accepted_options(self.msg_queue.append)
+        self._dispatcher = threading.Thread(target=self._dispatch, name='pubsub-dispatcher')
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+
+    def _register(self):
+        producer = self._local.producer = _Producer(threading.current_thread())
+        with self._lock:
+            self._producers += (producer,)
+        return producer
+
+    def notify(self, msg, **options):
+        if self._closed:
+            raise RuntimeError('notify() on a closed provider')
+        if self._accepted is not None:
+            unknown = set(options) - self._accepted - set(('delay', 'interval'))
+            if unknown:
+                raise TypeError('unexpected publish options: {}'.format(', '.join(sorted(unknown))))
+        if options.get('delay') is not None or options.get('interval') is not None:
+            with self._lock:
+                timer = Provider.notify(self, msg, **options)
+            if self._idle:
+                self._wakeup.set()
+            return timer
+        try:
+            producer = self._local.producer
+        except AttributeError:
+            producer = self._register()
+        producer.queue.append((msg, options))
+        producer.sent += 1
+        if self._idle:
+            self._wakeup.set()
+
+    def subscribe(self, msg, subscriber):
+        with self._lock:
+            return Provider.subscribe(self, msg, subscriber)
+
+    def _discard(self, topic, key, ref=None):
+        with self._lock:
+            Provider._discard(self, topic, key, ref)
+
+    def _resolve(self, topic):
+        # collected subscribers are purged under the lock too
+        refs = None if self._dead else self._matches.get(topic)
+        if refs is None:
+            with self._lock:
+                refs = Provider._resolve(self, topic)
+        return refs
+
+    def _expire_timers(self):
+        with self._lock:
+            Provider._expire_timers(self)
+
+    def _collect(self):
+        """Move the messages of all producers into msg_queue."""
+        msg_queue = self.msg_queue
+        moved = 0
+        for producer in self._producers:
+            queue = producer.queue
+            while queue:
+                msg, options = queue.popleft()
+                # counted first, a message append() rejects is done with too
+                producer.taken += 1
+                moved += 1
+                msg_queue.append(msg, **options)
+        return moved
+
+    def _pending(self):
+        return any(producer.queue for producer in self._producers)
+
+    def _forget_finished(self):
+        """Drop the deques of threads that ended and left nothing behind."""
+        with self._lock:
+            producers = []
+            for producer in self._producers:
+                if producer.queue or producer.thread.is_alive() or producer.delivered < producer.sent:
+                    producers.append(producer)
+                else:
+                    self._retired[0] += producer.sent
+                    self._retired[1] += producer.delivered
+            self._producers = tuple(producers)
+
+    def _dispatch(self):
+        while True:
+            try:
+                self._expire_timers()
+                # after an error the rest of the round is still in msg_queue
+                busy = self._collect() or len(self.msg_queue)
+                if busy:
+                    Provider.update(self)
+            except Exception:
+                self.errors += 1
+                busy = True
+            if busy:
+                self.rounds += 1
+                with self._drained:
+                    for producer in self._producers:
+                        producer.delivered = producer.taken
+                    self._drained.notify_all()
+                continue
+            if self._closed:
+                break
+            self._idle = True
+            self._wakeup.clear()
+            # a producer that saw _idle still False appended before this check
+            if not self._pending():
+                self._forget_finished()
+                timeout = self.IDLE_TIMEOUT
+                if self.timers is not None:
+                    with self._lock:
+                        due = self.timers.next_expiry()
+                    # a timer scheduled meanwhile wakes the dispatcher up
+                    if due is not None:
+                        timeout = min(timeout, due)
+                self._wakeup.wait(timeout)
+            self._idle = False
+
+    def update(self, timeout=None):
+        """Wait until the messages published so far have been delivered.
+
+        Returns False if that did not happen within ``timeout`` seconds."""
+        if threading.current_thread() is self._dispatcher:
+            return True
+        targets = [(producer, producer.sent) for producer in self._producers]
+        self._wakeup.set()
+        with self._drained:
+            return self._wait_for(lambda: all(producer.delivered >= sent for producer, sent in targets), timeout)
+
+    def _wait_for(self, predicate, timeout):
+        # Condition.wait_for() does not exist on Python 2
+        if timeout is not None:
+            timeout += time.time()
+        while not predicate():
+            remaining = None if timeout is None else timeout - time.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._drained.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            producers = self._producers
+            published, delivered = self._retired
+        return {
+            'producers': len(producers),
+            'published': published + sum(producer.sent for producer in producers),
+            'delivered': delivered + sum(producer.delivered for producer in producers),
+            'rounds': self.rounds,
+            'errors': self.errors,
+        }
+
+    def close(self):
+        """Deliver what is left and stop the dispatcher; publish nothing
+        from now on."""
+        self._closed = True
+        self._wakeup.set()
+        self._dispatcher.join()
+
+
+def main():
+    message_center = ThreadedProvider()
+
+    jim = Subscriber("jim", message_center)
+    jim.subscribe("cartoon")
+    gee = Subscriber("gee", message_center)
+    gee.subscribe("sports.#")
+
+    def broadcast(topics):
+        fftv = Publisher(message_center)
+        for topic in topics:
+            fftv.publish(topic)
+
+    producers = [
+        threading.Thread(target=broadcast, args=(["cartoon", "movie", "cartoon"],)),
+        threading.Thread(target=broadcast, args=(["sports.tennis", "sports.golf"],)),
+    ]
+    for producer in producers:
+        producer.start()
+        # one producer after the other keeps the output in a fixed order
+        producer.join()
+        message_center.update()
+
+    message_center.close()
+    stats = message_center.stats()
+    print("delivered {delivered} of {published} messages".format(**stats))
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got cartoon
+jim got cartoon
+gee got sports.tennis
+gee got sports.golf
+delivered 5 of 5 messages
+"""
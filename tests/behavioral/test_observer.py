@@ -1,7 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import gc
+import sys
+import threading
+import time
 import unittest
-from patterns.behavioral.observer import Subject, Data, DecimalViewer, HexViewer
+from patterns.behavioral.observer import Subject, Data, DecimalViewer, HexViewer, ObserverTimeout
+
+if sys.version_info >= (3, 2):
+    from concurrent.futures import ThreadPoolExecutor
 
 try:
     from unittest.mock import patch
@@ -36,6 +43,26 @@ class TestSubject(unittest.TestCase):
         cls.assertEqual(len(cls.s._observers), 0)
 
 
+class TestWeakObservers(unittest.TestCase):
+    def test_observers_shall_be_notified_once_in_attachment_order(cls):
+        s = Subject()
+        observers = [DecimalViewer() for _ in range(3)]
+        for observer in observers + observers[:1]:
+            s.attach(observer)
+        cls.assertEqual(list(s._observers), observers)
+        s.detach(observers[1])
+        s.detach(observers[1])
+        cls.assertEqual(list(s._observers), [observers[0], observers[2]])
+
+    def test_collected_observers_shall_be_detached(cls):
+        s = Subject()
+        observer = DecimalViewer()
+        s.attach(observer)
+        del observer
+        gc.collect()
+        cls.assertEqual(len(s._observers), 0)
+
+
 class TestData(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -61,3 +88,226 @@ class TestData(unittest.TestCase):
     def test_data_name_shall_be_changeable(cls):
         cls.sub.name = 'New Data Name'
         cls.assertEqual(cls.sub.name, 'New Data Name')
+
+
+class RecordingObserver(object):
+    def __init__(self):
+        self.updates = []
+
+    def update(self, subject):
+        self.updates.append((subject.data, subject.changed))
+
+
+class TestBatches(unittest.TestCase):
+    def setUp(cls):
+        cls.observer = RecordingObserver()
+
+    def test_batch_shall_notify_once_with_the_final_state(cls):
+        data = Data('Data')
+        data.attach(cls.observer)
+        with data.batch():
+            for value in range(10000):
+                data.data = value
+            with data.batch():
+                data.data = -1
+            cls.assertEqual(cls.observer.updates, [])
+        cls.assertEqual(cls.observer.updates, [(-1, frozenset(['data']))])
+
+    def test_batch_without_changes_shall_not_notify(cls):
+        data = Data('Data')
+        data.attach(cls.observer)
+        with data.batch():
+            pass
+        cls.assertEqual(cls.observer.updates, [])
+
+    def test_coalescing_subject_shall_notify_on_flush(cls):
+        data = Data('Data', coalesce=True)
+        data.attach(cls.observer)
+        data.data = 1
+        data.data = 2
+        cls.assertEqual(cls.observer.updates, [])
+        data.flush()
+        data.flush()
+        cls.assertEqual(cls.observer.updates, [(2, frozenset(['data']))])
+
+    def test_modifier_shall_only_be_skipped_if_it_made_every_change(cls):
+        data = Data('Data')
+        other = RecordingObserver()
+        for observer in (cls.observer, other):
+            data.attach(observer)
+        with data.batch():
+            data.notify(modifier=other, changed=('name',))
+        cls.assertEqual((len(cls.observer.updates), len(other.updates)), (1, 0))
+        with data.batch():
+            data.notify(modifier=other)
+            data.data = 3
+        cls.assertEqual((len(cls.observer.updates), len(other.updates)), (2, 1))
+
+
+class SleepingObserver(object):
+    def __init__(self, delay=0, error=None, gate=None):
+        self.delay = delay
+        self.error = error
+        self.gate = gate
+        self.threads = []
+
+    def update(self, subject):
+        self.threads.append(threading.current_thread())
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+
+
+@unittest.skipIf(sys.version_info < (3, 2), "requires python3.2 or higher")
+class TestConcurrentNotify(unittest.TestCase):
+    def setUp(cls):
+        cls.executor = ThreadPoolExecutor(4)
+        cls.addCleanup(cls.executor.shutdown)
+
+    def test_observers_shall_run_concurrently_slowest_reported_first(cls):
+        data = Data('Data', executor=cls.executor)
+        observers = [SleepingObserver(0.05), SleepingObserver(0.01), SleepingObserver(0.05)]
+        for observer in observers:
+            data.attach(observer)
+        started = time.time()
+        data.data = 1
+        cls.assertLess(time.time() - started, 0.1)
+        cls.assertIs(data.last_report[-1].observer, observers[1])
+        cls.assertEqual([entry.error for entry in data.last_report], [None] * 3)
+        cls.assertNotIn(threading.current_thread(), [thread for o in observers for thread in o.threads])
+
+    def test_failing_and_slow_observers_shall_not_affect_the_others(cls):
+        gate = threading.Event()
+        cls.addCleanup(gate.set)
+        data = Data('Data', executor=cls.executor, timeout=0.05)
+        failing = SleepingObserver(error=ValueError('broken'))
+        stuck = SleepingObserver(gate=gate)
+        fine = SleepingObserver()
+        for observer in (failing, stuck, fine):
+            data.attach(observer)
+        data.data = 1
+        errors = dict((id(entry.observer), entry.error) for entry in data.last_report)
+        cls.assertIsInstance(errors[id(failing)], ValueError)
+        cls.assertIsInstance(errors[id(stuck)], ObserverTimeout)
+        cls.assertIsNone(errors[id(fine)])
+        cls.assertIs(data.last_report[0].observer, stuck)
+
+    def test_timeout_shall_count_from_the_start_of_each_observer(cls):
+        executor = ThreadPoolExecutor(2)
+        cls.addCleanup(executor.shutdown)
+        data = Data('Data', executor=executor, timeout=0.1)
+        observers = [SleepingObserver(0.06) for _ in range(6)]
+        for observer in observers:
+            data.attach(observer)
+        data.data = 1
+        cls.assertEqual([entry.error for entry in data.last_report], [None] * 6)
+        cls.assertLess(max(entry.elapsed for entry in data.last_report), 0.1)
+
+    def test_observers_that_cannot_start_shall_time_out(cls):
+        executor = ThreadPoolExecutor(1)
+        cls.addCleanup(executor.shutdown)
+        gate = threading.Event()
+        cls.addCleanup(gate.set)
+        data = Data('Data', executor=executor, timeout=0.05)
+        stuck = SleepingObserver(gate=gate)
+        queued = SleepingObserver()
+        data.attach(stuck)
+        data.attach(queued)
+        data.data = 1
+        errors = dict((id(entry.observer), entry.error) for entry in data.last_report)
+        cls.assertIsInstance(errors[id(stuck)], ObserverTimeout)
+        cls.assertIsInstance(errors[id(queued)], ObserverTimeout)
+        cls.assertEqual(queued.threads, [])
+
+
+class Position(Subject):
+    def __init__(self):
+        Subject.__init__(self)
+        self.x = self.y = 0
+        self.has_changed('x', 0)
+        self.has_changed('y', 0)
+
+    def move(self, x, y):
+        changed = [field for field, value in (('x', x), ('y', y)) if self.has_changed(field, value)]
+        self.x, self.y = x, y
+        if changed:
+            self.notify(changed=changed)
+
+
+class RecordingFields(object):
+    def __init__(self):
+        self.updates = []
+
+    def update(self, subject):
+        self.updates.append(subject.changed)
+
+
+class TestAttributeObservers(unittest.TestCase):
+    def test_observers_shall_only_be_updated_for_their_fields(cls):
+        position = Position()
+        horizontal, vertical, everything = RecordingFields(), RecordingFields(), RecordingFields()
+        position.attach(horizontal, fields=['x'])
+        position.attach(vertical, fields=['y'])
+        position.attach(everything)
+        position.move(1, 0)
+        position.move(1, 2)
+        position.move(1, 2)
+        cls.assertEqual(horizontal.updates, [frozenset(['x'])])
+        cls.assertEqual(vertical.updates, [frozenset(['y'])])
+        cls.assertEqual(everything.updates, [frozenset(['x']), frozenset(['y'])])
+        cls.assertEqual(position.skipped_updates, 2)
+
+    def test_unchanged_values_shall_not_notify(cls):
+        data = Data('Data')
+        observer = RecordingObserver()
+        data.attach(observer)
+        data.data = 0
+        data.data = 1
+        data.data = 1
+        cls.assertEqual([value for value, _ in observer.updates], [1])
+
+    def test_large_payloads_changed_in_place_shall_notify(cls):
+        data = Data('Data')
+        observer = RecordingObserver()
+        data.attach(observer)
+        payload = bytearray(Subject.DIGEST_SIZE)
+        data.data = payload
+        data.data = payload
+        payload[0] = 1
+        data.data = payload
+        cls.assertEqual(len(observer.updates), 2)
+
+    def test_small_payloads_changed_in_place_shall_notify(cls):
+        data = Data('Data')
+        observer = RecordingObserver()
+        data.attach(observer)
+        payload = bytearray(b'abc')
+        data.data = payload
+        data.data = payload
+        payload[0] = ord('x')
+        data.data = payload
+        cls.assertEqual(len(observer.updates), 2)
+
+    def test_mutable_values_set_again_shall_notify(cls):
+        data = Data('Data')
+        observer = RecordingObserver()
+        data.attach(observer)
+        values = [1]
+        data.data = values
+        values.append(2)
+        data.data = values
+        data.data = [1, 2]
+        data.data = [1, 2]
+        cls.assertEqual(len(observer.updates), 2)
+
+    def test_mutable_value_changed_in_place_shall_notify_for_an_equal_value(cls):
+        data = Data('Data')
+        observer = RecordingObserver()
+        data.attach(observer)
+        values = [1]
+        data.data = values
+        values.append(2)
+        data.data = [1, 2]
+        cls.assertEqual(len(observer.updates), 2)
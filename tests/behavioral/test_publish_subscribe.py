@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import unittest
-from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber, TopicTrie
 
 try:
     from unittest.mock import patch, call
@@ -65,3 +65,135 @@ class TestProvider(unittest.TestCase):
             mock_subscriber1_run.assert_has_calls(expected_sub1_calls)
             expected_sub2_calls = [call('sub 2 msg 1'), call('sub 2 msg 2')]
             mock_subscriber2_run.assert_has_calls(expected_sub2_calls)
+
+    def test_wildcard_subscriptions_shall_match_topic_levels(cls):
+        pro = Provider()
+        pub = Publisher(pro)
+        one_level = Subscriber('one level', pro)
+        one_level.subscribe('sports.*')
+        any_levels = Subscriber('any levels', pro)
+        any_levels.subscribe('sports.#')
+        for topic in ('sports', 'sports.tennis', 'sports.football.uk', 'music.tennis'):
+            pub.publish(topic)
+        with patch.object(one_level, 'run') as mock_one_level_run, patch.object(
+            any_levels, 'run'
+        ) as mock_any_levels_run:
+            pro.update()
+            cls.assertEqual(mock_one_level_run.call_args_list, [call('sports.tennis')])
+            cls.assertEqual(
+                mock_any_levels_run.call_args_list,
+                [call('sports'), call('sports.tennis'), call('sports.football.uk')],
+            )
+
+    def test_overlapping_subscriptions_shall_deliver_once(cls):
+        pro = Provider()
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('sports.tennis')
+        sub.subscribe('sports.*')
+        sub.subscribe('#')
+        cls.assertEqual(pro.match('sports.tennis'), (sub,))
+
+    def test_match_cache_shall_follow_subscription_changes(cls):
+        pro = Provider()
+        sub = Subscriber('sub name', pro)
+        cls.assertEqual(pro.match('sports.tennis'), ())
+        sub.subscribe('sports.*')
+        cls.assertEqual(pro.match('sports.tennis'), (sub,))
+        sub.unsubscribe('sports.*')
+        cls.assertEqual(pro.match('sports.tennis'), ())
+
+    def test_subscription_change_shall_keep_unrelated_cached_topics(cls):
+        pro = Provider()
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('cartoon')
+        for topic in ('cartoon', 'sports.tennis', 'sports.golf', 'music'):
+            pro.match(topic)
+        sub.subscribe('sports.*')
+        cls.assertEqual(sorted(pro._matches), ['cartoon', 'music'])
+        cls.assertEqual(pro.match('sports.golf'), (sub,))
+        sub.unsubscribe('cartoon')
+        cls.assertEqual(sorted(pro._matches), ['music', 'sports.golf'])
+        cls.assertEqual(pro.match('cartoon'), ())
+
+    def test_subscription_handle_shall_cancel_its_subscription(cls):
+        pro = Provider()
+        sub = Subscriber('sub name', pro)
+        cartoon = sub.subscribe('cartoon')
+        sub.subscribe('music')
+        cartoon.cancel()
+        cartoon.cancel()
+        cls.assertEqual(pro.match('cartoon'), ())
+        cls.assertEqual(pro.match('music'), (sub,))
+
+    def test_collected_subscriber_shall_drop_out_of_its_topics(cls):
+        pro = Provider()
+        pub = Publisher(pro)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('cartoon')
+        sub.subscribe('sports.#')
+        cls.assertEqual(pro.match('sports.tennis'), (sub,))
+        del sub
+        cls.assertEqual(pro.match('sports.tennis'), ())
+        cls.assertEqual(len(pro.subscribers['cartoon']), 0)
+        cls.assertEqual(pro._topics.match('cartoon'), [])
+        pub.publish('cartoon')
+        pro.update()
+
+    def test_stale_handle_shall_not_cancel_a_new_subscription(cls):
+        pro = Provider()
+        sub = Subscriber('sub name', pro)
+        stale = sub.subscribe('cartoon')
+        sub.subscribe('cartoon')
+        stale.cancel()
+        cls.assertEqual(pro.match('cartoon'), (sub,))
+
+
+class TestTopicTrie(unittest.TestCase):
+    def test_covered_shall_return_the_topics_a_pattern_matches(cls):
+        trie = TopicTrie()
+        for topic in ('a', 'a.b', 'a.b.c', 'a.z', 'b.z'):
+            trie.insert(topic)
+        cls.assertEqual(sorted(trie.covered('a.*')), ['a.b', 'a.z'])
+        cls.assertEqual(sorted(trie.covered('a.#')), ['a', 'a.b', 'a.b.c', 'a.z'])
+        cls.assertEqual(sorted(trie.covered('#.z')), ['a.z', 'b.z'])
+        cls.assertEqual(trie.covered('a.b.c'), ['a.b.c'])
+        cls.assertEqual(trie.covered('c'), [])
+
+    def test_removed_patterns_shall_not_match(cls):
+        trie = TopicTrie()
+        trie.insert('a.b.c')
+        trie.insert('a.#')
+        trie.remove('a.b.c')
+        cls.assertEqual(trie.match('a.b.c'), ['a.#'])
+        trie.remove('a.#')
+        cls.assertEqual(trie.match('a.b.c'), [])
+        cls.assertEqual(trie._root.children, {})
+
+    def test_hash_shall_match_zero_or_more_levels(cls):
+        trie = TopicTrie()
+        trie.insert('a.#.z')
+        cls.assertEqual(trie.match('a.z'), ['a.#.z'])
+        cls.assertEqual(trie.match('a.b.c.z'), ['a.#.z'])
+        cls.assertEqual(trie.match('a.b.c'), [])
+
+
+class TestBatchProvider(unittest.TestCase):
+    def test_subscriber_shall_get_one_batch_per_update(cls):
+        pro = Provider(batch=True)
+        pub = Publisher(pro)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('cartoon')
+        sub.subscribe('music')
+        for msg in ('cartoon', 'music', 'ads', 'cartoon'):
+            pub.publish(msg)
+        with patch.object(sub, 'run_batch') as mock_subscriber_run_batch:
+            pro.update()
+            mock_subscriber_run_batch.assert_called_once_with(['cartoon', 'cartoon', 'music'])
+        cls.assertEqual(len(pro.msg_queue), 0)
+
+    def test_default_run_batch_shall_run_every_message(cls):
+        pro = Provider(batch=True)
+        sub = Subscriber('sub name', pro)
+        with patch.object(sub, 'run') as mock_subscriber_run:
+            sub.run_batch(['a', 'b'])
+            cls.assertEqual(mock_subscriber_run.call_args_list, [call('a'), call('b')])
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import sys
+import unittest
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from patterns.behavioral.publish_subscribe import Subscriber
+    from patterns.behavioral.publish_subscribe_async__py3 import (
+        AsyncProvider,
+        AsyncPublisher,
+        DROP_NEWEST,
+        DROP_OLDEST,
+    )
+
+
+class RecordingSubscriber(object):
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.received = []
+
+    def run(self, msg):
+        self.received.append(msg)
+        if self.delay:
+            return asyncio.sleep(self.delay)
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "requires python3.5 or higher")
+class TestAsyncProvider(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.pro = AsyncProvider(maxsize=2)
+        self.pub = AsyncPublisher(self.pro)
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.pro.close())
+        self.loop.close()
+
+    def publish(self, *msgs):
+        # one task per message, all of them scheduled before any consumer runs
+        tasks = [self.loop.create_task(self.pub.publish(msg)) for msg in msgs]
+        self.loop.run_until_complete(asyncio.wait(tasks))
+
+    def test_update_shall_wait_for_every_subscriber(self):
+        fast, slow = RecordingSubscriber(), RecordingSubscriber(delay=0.01)
+        self.pro.subscribe('cartoon', fast)
+        self.pro.subscribe('cartoon', slow)
+        self.publish('cartoon', 'cartoon', 'cartoon')
+        self.loop.run_until_complete(self.pro.update())
+        self.assertEqual(fast.received, ['cartoon'] * 3)
+        self.assertEqual(slow.received, ['cartoon'] * 3)
+
+    def test_slow_subscriber_shall_not_delay_fast_one(self):
+        fast, slow = RecordingSubscriber(), RecordingSubscriber(delay=10)
+        self.pro.subscribe('cartoon', fast)
+        self.pro.subscribe('cartoon', slow, policy=DROP_NEWEST)
+        self.publish('cartoon', 'cartoon', 'cartoon', 'cartoon')
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(fast.received, ['cartoon'] * 4)
+        self.assertEqual(slow.received, ['cartoon'])
+
+    def test_drop_policies_shall_count_dropped_messages(self):
+        newest, oldest = RecordingSubscriber(), RecordingSubscriber()
+        self.pro.subscribe('a', newest, policy=DROP_NEWEST)
+        self.pro.subscribe('a', oldest, policy=DROP_OLDEST)
+        self.pro.subscribe('b', newest)
+        self.pro.subscribe('b', oldest)
+        self.publish('a', 'b', 'a', 'b')
+        self.loop.run_until_complete(self.pro.update())
+        self.assertEqual(newest.received, ['a', 'b'])
+        self.assertEqual(oldest.received, ['a', 'b'])
+        self.assertEqual([s['dropped'] for s in self.pro.stats()], [2, 2])
+
+    def test_failing_subscriber_shall_keep_consuming(self):
+        sub = Subscriber('sub name', self.pro)
+        sub.run = lambda msg: 1 / 0
+        sub.subscribe('a')
+        self.publish('a', 'a')
+        self.loop.run_until_complete(self.pro.update())
+        self.assertEqual(self.pro.stats()[0]['errors'], 2)
+
+    def test_unsubscribed_subscriber_shall_lose_its_mailbox(self):
+        sub = RecordingSubscriber()
+        self.pro.subscribe('a', sub)
+        self.pro.subscribe('b', sub)
+        self.pro.unsubscribe('a', sub)
+        self.assertIn(id(sub), self.pro.mailboxes)
+        self.pro.unsubscribe('b', sub)
+        self.assertNotIn(id(sub), self.pro.mailboxes)
+
+    def test_repeated_subscriptions_shall_count_once(self):
+        sub = RecordingSubscriber()
+        self.pro.subscribe('a', sub)
+        self.pro.subscribe('a', sub)
+        self.pro.unsubscribe('b', sub)
+        self.pro.unsubscribe('a', sub)
+        self.assertNotIn(id(sub), self.pro.mailboxes)
+        self.pro.unsubscribe('a', sub)
+
+    def test_subscription_handle_shall_release_the_mailbox(self):
+        sub = RecordingSubscriber()
+        handle = self.pro.subscribe('a', sub)
+        self.publish('a')
+        task = self.pro.mailboxes[id(sub)].task
+        handle.cancel()
+        self.assertNotIn(id(sub), self.pro.mailboxes)
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertTrue(task.cancelled())
+        self.publish('a')
+        self.assertEqual(sub.received, ['a'])
+
+    def test_collected_subscriber_shall_release_its_mailbox(self):
+        sub = RecordingSubscriber()
+        self.pro.subscribe('a', sub)
+        self.publish('a')
+        self.loop.run_until_complete(self.pro.update())
+        task = self.pro.mailboxes[id(sub)].task
+        del sub
+        self.publish('a')
+        self.assertEqual(self.pro.mailboxes, {})
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertTrue(task.cancelled())
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "requires python3.5 or higher")
+class TestOutput(unittest.TestCase):
+    def test_output(self):
+        import io
+        from contextlib import redirect_stdout
+        from patterns.behavioral.publish_subscribe_async__py3 import main, OUTPUT
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            main()
+        self.assertEqual(f.getvalue().strip(), OUTPUT.strip())
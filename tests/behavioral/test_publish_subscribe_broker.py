@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+if sys.version_info >= (3, 3):
+    from patterns.behavioral.publish_subscribe_broker__py3 import (
+        ACK,
+        Broker,
+        PUBLISH,
+        RemotePublisher,
+        RemoteSubscriber,
+        frame,
+        parse,
+    )
+
+
+class RecordingSubscriber(object):
+    def __init__(self):
+        self.received = []
+
+    def run(self, msg):
+        self.received.append(msg)
+
+
+@unittest.skipIf(sys.version_info < (3, 3), "requires python3.3 or higher")
+class TestFrames(unittest.TestCase):
+    def test_parse_shall_leave_incomplete_frames_in_the_buffer(self):
+        data = frame(PUBLISH, b'cartoon') + frame(ACK, b'')
+        buffer = bytearray(data + data[:6])
+        self.assertEqual(parse(buffer), [(PUBLISH, b'cartoon'), (ACK, b'')])
+        self.assertEqual(bytes(buffer), data[:6])
+        buffer += data[6:]
+        self.assertEqual(parse(buffer), [(PUBLISH, b'cartoon'), (ACK, b'')])
+        self.assertEqual(buffer, bytearray())
+
+
+@unittest.skipIf(sys.version_info < (3, 3), "requires python3.3 or higher")
+class TestBroker(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'broker.sock')
+        self.broker = Broker(self.path)
+        self.thread = threading.Thread(target=self.broker.serve_forever, args=(0.01,))
+        self.thread.start()
+
+    def tearDown(self):
+        self.broker.shutdown()
+        self.thread.join()
+        shutil.rmtree(self.directory)
+
+    def receive(self, sub, count):
+        received = []
+        sub.run = received.append
+        while len(received) < count and sub.poll(5):
+            pass
+        return received
+
+    def test_remote_subscribers_shall_get_matching_messages_in_order(self):
+        cartoon = RemoteSubscriber('cartoon', self.path)
+        cartoon.subscribe('cartoon')
+        sports = RemoteSubscriber('sports', self.path)
+        sports.subscribe('sports.#')
+        pub = RemotePublisher(self.path)
+        for i in range(3000):
+            pub.publish('cartoon' if i % 3 else 'sports.{}'.format(i))
+        pub.flush()
+        self.assertEqual(pub.acknowledged, 3000)
+        self.assertEqual(self.receive(cartoon, 2000), ['cartoon'] * 2000)
+        self.assertEqual(self.receive(sports, 1000), ['sports.{}'.format(i) for i in range(0, 3000, 3)])
+        for client in (cartoon, sports, pub):
+            client.close()
+
+    def test_unsubscribed_or_disconnected_subscribers_shall_get_nothing(self):
+        local = RecordingSubscriber()
+        self.broker.provider.subscribe('cartoon', local)
+        sub = RemoteSubscriber('sub', self.path)
+        sub.subscribe('cartoon')
+        gone = RemoteSubscriber('gone', self.path)
+        gone.subscribe('cartoon')
+        gone.close()
+        sub.unsubscribe('cartoon')
+        pub = RemotePublisher(self.path)
+        pub.publish('cartoon')
+        pub.close()
+        self.assertEqual(sub.poll(0.05), 0)
+        self.assertEqual(local.received, ['cartoon'])
+        sub.close()
+
+    def assert_broker_serves(self):
+        sub = RemoteSubscriber('sub', self.path)
+        sub.subscribe('movie')
+        pub = RemotePublisher(self.path)
+        pub.publish('movie')
+        pub.close()
+        self.assertEqual(self.receive(sub, 1), ['movie'])
+        sub.close()
+        self.assertTrue(self.thread.is_alive())
+
+    def test_client_leaving_with_a_backlog_shall_not_stop_the_broker(self):
+        stuck = RemoteSubscriber('stuck', self.path)
+        stuck.subscribe('cartoon')
+        pub = RemotePublisher(self.path)
+        # far more than the socket buffers hold, as the subscriber never reads
+        for _ in range(200000):
+            pub.publish('cartoon')
+        pub.flush()
+        stuck.sock.close()
+        pub.publish('cartoon')
+        pub.close()
+        self.assert_broker_serves()
+
+    def test_client_sending_invalid_utf8_shall_be_dropped(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        sock.sendall(frame(PUBLISH, b'\xff\xfe'))
+        self.assertEqual(sock.recv(16), b'')
+        sock.close()
+        self.assert_broker_serves()
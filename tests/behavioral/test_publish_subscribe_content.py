@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import operator
+import random
+import unittest
+from patterns.behavioral.publish_subscribe_content import ContentIndex, ContentProvider, ContentSubscriber, parse
+
+try:
+    from unittest.mock import patch, call
+except ImportError:
+    from mock import patch, call
+
+COMPARE = {'==': operator.eq, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+class TestContentIndex(unittest.TestCase):
+    def test_parse_shall_split_field_and_operator(self):
+        self.assertEqual(
+            sorted(parse({'region': 'eu', 'size >': 100, 'price <=': 5})),
+            [('price', '<=', 5), ('region', '==', 'eu'), ('size', '>', 100)],
+        )
+        self.assertRaises(ValueError, parse, {'size !=': 1})
+
+    def test_index_shall_agree_with_evaluating_every_predicate(self):
+        rnd = random.Random(42)
+        index = ContentIndex()
+        filters = {}
+        for sid in range(500):
+            predicates = [
+                (field, rnd.choice(list(COMPARE)), rnd.randint(0, 20))
+                for field in rnd.sample(['a', 'b', 'c'], rnd.randint(0, 3))
+            ]
+            filters[sid] = predicates
+            index.add(sid, predicates)
+        for sid in range(0, 500, 7):
+            index.remove(sid)
+            del filters[sid]
+        for _ in range(200):
+            msg = dict((field, rnd.randint(0, 20)) for field in rnd.sample(['a', 'b', 'c', 'd'], rnd.randint(0, 4)))
+            expected = [
+                sid
+                for sid, predicates in sorted(filters.items())
+                if all(field in msg and COMPARE[op](msg[field], value) for field, op, value in predicates)
+            ]
+            self.assertEqual(index.match(msg), expected)
+
+    def test_incomparable_values_shall_not_match(self):
+        index = ContentIndex()
+        index.add(0, [('size', '>', 10)])
+        index.add(1, [('tags', '==', 'x')])
+        self.assertEqual(index.match({'size': 'large', 'tags': ['x']}), [])
+
+
+class TestContentProvider(unittest.TestCase):
+    def test_subscriber_shall_get_matching_messages_once(self):
+        pro = ContentProvider()
+        sub = ContentSubscriber('sub name', pro)
+        sub.subscribe({'region': 'eu'})
+        sub.subscribe({'size >': 100})
+        pro.notify({'region': 'eu', 'size': 150})
+        pro.notify({'region': 'us', 'size': 50})
+        with patch.object(sub, 'run') as mock_subscriber_run:
+            pro.update()
+            self.assertEqual(mock_subscriber_run.call_args_list, [call({'region': 'eu', 'size': 150})])
+
+    def test_unsubscribed_filter_shall_not_match(self):
+        pro = ContentProvider()
+        sub = ContentSubscriber('sub name', pro)
+        sub.subscribe({'region': 'eu'})
+        sub.unsubscribe({'region': 'eu'})
+        self.assertEqual(pro.match({'region': 'eu'}), [])
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from patterns.behavioral.publish_subscribe import Publisher, Subscriber
+from patterns.behavioral.publish_subscribe_log import LogProvider, SegmentedLog
+
+try:
+    from unittest.mock import patch, call
+except ImportError:
+    from mock import patch, call
+
+
+class TestSegmentedLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_appended_payloads_shall_be_readable_by_offset(self):
+        log = SegmentedLog(self.directory, segment_size=16, max_records=3)
+        payloads = [b'first', b'second', b'', b'third', b'0123456789abcdef']
+        offsets = [log.append(payload) for payload in payloads]
+        self.assertEqual(offsets, [0, 1, 2, 3, 4])
+        self.assertEqual([log.read(offset) for offset in offsets], payloads)
+        self.assertEqual(log.bases, [0, 3, 4])
+        log.close()
+
+    def test_log_shall_be_reopened_with_its_messages_and_offsets(self):
+        log = SegmentedLog(self.directory, segment_size=16, max_records=3)
+        for payload in (b'a', b'b', b'c', b'd'):
+            log.append(payload)
+        log.commit('consumer', 3)
+        log.close()
+        log = SegmentedLog(self.directory, segment_size=16, max_records=3)
+        self.assertEqual(log.next_offset, 4)
+        self.assertEqual(log.read(3), b'd')
+        self.assertEqual(log.append(b'e'), 4)
+        self.assertEqual(log.committed('consumer'), 3)
+        self.assertEqual(log.committed('other'), 0)
+        log.close()
+        self.assertEqual(len([name for name in os.listdir(self.directory) if name.endswith('.log')]), 2)
+
+    def test_oversized_or_unknown_messages_shall_be_rejected(self):
+        log = SegmentedLog(self.directory, segment_size=4)
+        with self.assertRaises(ValueError):
+            log.append(b'too large')
+        with self.assertRaises(IndexError):
+            log.read(0)
+        log.close()
+
+
+class TestLogProvider(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_queue_shall_hold_offsets_only(self):
+        pro = LogProvider(self.directory)
+        pub = Publisher(pro)
+        pub.publish('cartoon')
+        pub.publish('music')
+        self.assertEqual(list(pro.msg_queue), [0, 1])
+        pro.close()
+
+    def test_undelivered_messages_shall_survive_a_restart(self):
+        pro = LogProvider(self.directory)
+        pub = Publisher(pro)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('cartoon')
+        pub.publish('cartoon')
+        with patch.object(sub, 'run'):
+            pro.update()
+        pub.publish('music')
+        pub.publish('cartoon')
+        pro.close()
+
+        pro = LogProvider(self.directory)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('cartoon')
+        with patch.object(sub, 'run') as mock_subscriber_run:
+            pro.update()
+            self.assertEqual(mock_subscriber_run.call_args_list, [call('cartoon')])
+        self.assertEqual(pro.log.committed(pro.consumer), 3)
+        pro.close()
+
+    def test_subscriber_shall_replay_its_messages_from_an_offset(self):
+        pro = LogProvider(self.directory)
+        pub = Publisher(pro)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('cartoon')
+        for msg in ('cartoon', 'music', 'cartoon', 'cartoon'):
+            pub.publish(msg)
+        with patch.object(sub, 'run') as mock_subscriber_run:
+            pro.update()
+            pro.replay(sub, 1, 3)
+            self.assertEqual(mock_subscriber_run.call_count, 4)
+        pro.close()
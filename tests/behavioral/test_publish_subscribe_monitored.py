@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import unittest
+from patterns.behavioral.publish_subscribe import Publisher
+from patterns.behavioral.publish_subscribe_queues import TimingWheel
+from patterns.behavioral.publish_subscribe_monitored import BUFFER, DISCONNECT, SKIP, MonitoredProvider
+
+
+class RecordingSubscriber(object):
+    def __init__(self, name, delay=0):
+        self.name = name
+        self.delay = delay
+        self.received = []
+
+    def run(self, msg):
+        if self.delay:
+            time.sleep(self.delay)
+        self.received.append(msg)
+
+
+class TestMonitoredProvider(unittest.TestCase):
+    def deliver(self, policy, **kwargs):
+        provider = MonitoredProvider(threshold=0.01, policy=policy, **kwargs)
+        fast = RecordingSubscriber('fast')
+        slow = RecordingSubscriber('slow', delay=0.02)
+        for sub in (fast, slow):
+            provider.subscribe('news.*', sub)
+        pub = Publisher(provider)
+        for i in range(5):
+            pub.publish('news.{}'.format(i))
+        provider.update()
+        metrics = dict((m['subscriber'], m) for m in provider.metrics())
+        return provider, fast, slow, metrics
+
+    def test_skip_shall_probe_a_slow_subscriber_once_per_update(self):
+        provider, fast, slow, metrics = self.deliver(SKIP)
+        self.assertEqual(len(fast.received), 5)
+        self.assertEqual(slow.received, ['news.0'])
+        self.assertEqual(metrics['slow']['skipped'], 4)
+        self.assertTrue(metrics['slow']['slow'])
+        self.assertFalse(metrics['fast']['slow'])
+        Publisher(provider).publish('news.5')
+        provider.update()
+        self.assertEqual(slow.received, ['news.0', 'news.5'])
+
+    def test_buffer_shall_deliver_the_latest_messages_last(self):
+        provider, fast, slow, metrics = self.deliver(BUFFER, backlog=2)
+        self.assertEqual(slow.received, ['news.0', 'news.3', 'news.4'])
+        self.assertEqual((metrics['slow']['dropped'], metrics['slow']['queued']), (2, 0))
+
+    def test_disconnect_shall_unsubscribe_a_slow_subscriber(self):
+        provider, fast, slow, metrics = self.deliver(DISCONNECT)
+        self.assertEqual(slow.received, ['news.0'])
+        self.assertTrue(metrics['slow']['disconnected'])
+        self.assertEqual(provider.match('news.9'), (fast,))
+
+    def test_unknown_policy_shall_be_rejected(self):
+        self.assertRaises(ValueError, MonitoredProvider, policy='ignore')
+
+    def test_delayed_messages_shall_be_delivered_once_due(self):
+        now = [1000.0]
+        provider = MonitoredProvider()
+        provider.timers = TimingWheel(clock=lambda: now[0])
+        sub = RecordingSubscriber('sub')
+        provider.subscribe('news', sub)
+        Publisher(provider).publish('news', delay=2)
+        provider.update()
+        self.assertEqual(sub.received, [])
+        now[0] += 2
+        provider.update()
+        self.assertEqual(sub.received, ['news'])
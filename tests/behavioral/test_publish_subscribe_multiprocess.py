@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os
+import unittest
+from patterns.behavioral.publish_subscribe import Publisher, Subscriber
+from patterns.behavioral.publish_subscribe_queues import TimingWheel
+from patterns.behavioral.publish_subscribe_multiprocess import ProcessProvider
+
+
+class RecordingSubscriber(Subscriber):
+    def __init__(self, name, msg_center, received):
+        Subscriber.__init__(self, name, msg_center)
+        self.received = received
+
+    def run(self, msg):
+        self.received.append((self.name, msg, os.getpid()))
+
+
+class ExitingSubscriber(RecordingSubscriber):
+    def run(self, msg):
+        if msg == 'exit':
+            raise SystemExit(1)
+        if msg == 'crash':
+            os._exit(1)
+        RecordingSubscriber.run(self, msg)
+
+
+class TestProcessProvider(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.manager = multiprocessing.Manager()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.manager.shutdown()
+
+    def setUp(self):
+        self.received = self.manager.list()
+        self.pro = ProcessProvider(workers=2)
+        self.pub = Publisher(self.pro)
+
+    def tearDown(self):
+        self.pro.close()
+
+    def test_topics_shall_be_delivered_in_order_by_one_worker(self):
+        topics = ['topic {}'.format(i) for i in range(8)]
+        subscribers = [RecordingSubscriber(topic, self.pro, self.received) for topic in topics]
+        for sub in subscribers:
+            sub.subscribe(sub.name)
+        for i in range(5):
+            for topic in topics:
+                self.pub.publish(topic)
+        self.pro.update()
+        self.assertEqual(len(self.received), 40)
+        for topic in topics:
+            deliveries = [d for d in self.received if d[1] == topic]
+            self.assertEqual(len(deliveries), 5)
+            self.assertEqual(len(set(pid for _, _, pid in deliveries)), 1)
+        self.assertNotIn(os.getpid(), set(pid for _, _, pid in self.received))
+
+    def test_worker_stats_shall_count_deliveries(self):
+        sub = RecordingSubscriber('sub', self.pro, self.received)
+        sub.subscribe('music')
+        sub.subscribe('cartoon')
+        self.pub.publish('music')
+        self.pub.publish('cartoon')
+        self.pub.publish('cartoon')
+        self.pro.update()
+        expected = [0, 0]
+        expected[self.pro.shard('music')] += 1
+        expected[self.pro.shard('cartoon')] += 2
+        stats = self.pro.worker_stats()
+        self.assertEqual([s['delivered'] for s in stats], expected)
+        self.assertEqual(sum(s['errors'] for s in stats), 0)
+
+    def test_unsubscribed_subscriber_shall_not_be_run(self):
+        sub = RecordingSubscriber('sub', self.pro, self.received)
+        sub.subscribe('music')
+        self.pub.publish('music')
+        self.pro.update()
+        sub.unsubscribe('music')
+        self.pub.publish('music')
+        self.pro.update()
+        self.assertEqual(len(self.received), 1)
+
+    def test_collected_subscriber_shall_be_forgotten_by_workers(self):
+        sub = RecordingSubscriber('sub', self.pro, self.received)
+        sub.subscribe('music')
+        self.pub.publish('music')
+        self.pro.update()
+        worker = self.pro._pool[self.pro.shard('music')]
+        self.assertEqual(worker.shipped, set([id(sub)]))
+        del sub
+        self.assertEqual(len(worker.shipped), 1)
+        self.pro.update()
+        self.assertEqual(worker.shipped, set())
+        other = RecordingSubscriber('other', self.pro, self.received)
+        other.subscribe('music')
+        self.pub.publish('music')
+        self.pro.update()
+        self.assertEqual([d[0] for d in self.received], ['sub', 'other'])
+
+    def test_delayed_messages_shall_be_delivered_once_due(self):
+        now = [1000.0]
+        self.pro.timers = TimingWheel(clock=lambda: now[0])
+        sub = RecordingSubscriber('sub', self.pro, self.received)
+        sub.subscribe('cartoon')
+        self.pub.publish('cartoon', delay=2)
+        self.pro.update()
+        self.assertEqual(len(self.received), 0)
+        now[0] += 2
+        self.pro.update()
+        self.assertEqual([msg for _, msg, _ in self.received], ['cartoon'])
+
+    def test_system_exit_shall_count_as_an_error(self):
+        sub = ExitingSubscriber('sub', self.pro, self.received)
+        sub.subscribe('exit')
+        sub.subscribe('music')
+        self.pub.publish('exit')
+        self.pro.update()
+        self.pub.publish('music')
+        self.pro.update()
+        self.assertEqual([d[1] for d in self.received], ['music'])
+        self.assertEqual(sum(s['errors'] for s in self.pro.worker_stats()), 1)
+
+    def test_dead_worker_shall_make_update_raise(self):
+        self.pro.LIVENESS_INTERVAL = 0.05
+        sub = ExitingSubscriber('sub', self.pro, self.received)
+        sub.subscribe('crash')
+        sub.subscribe('music')
+        self.pub.publish('crash')
+        with self.assertRaises(RuntimeError):
+            self.pro.update()
+        self.pub.publish('music')
+        self.pro.update()
+        self.assertEqual([d[1] for d in self.received], ['music'])
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+from patterns.behavioral.publish_subscribe_pro import (
+    LEAST_LOADED,
+    ConsumerGroup,
+    PartitionedProvider,
+    Provider,
+    Publisher,
+    RecordQueue,
+    Schema,
+    Subscriber,
+)
+
+
+class RecordingSubscriber(Subscriber):
+    def __init__(self, sub_name, msg_center, gate=None):
+        Subscriber.__init__(self, sub_name, msg_center)
+        self.gate = gate
+        self.received = []
+
+    def run(self, msg):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.received.append((msg, threading.current_thread()))
+
+
+class TestPartitionedProvider(unittest.TestCase):
+    def setUp(self):
+        self.pro = PartitionedProvider(partitions=2)
+        names = ['publisher {}'.format(i) for i in range(10)]
+        # two publishers that land on different partitions
+        self.first = names[0]
+        self.second = next(name for name in names if self.pro.partition(name) != self.pro.partition(self.first))
+
+    def tearDown(self):
+        self.pro.close()
+
+    def test_messages_of_a_publisher_shall_keep_their_order(self):
+        sub = RecordingSubscriber('sub', self.pro)
+        sub.subscribe(self.first)
+        pub = Publisher(self.first, self.pro)
+        for i in range(100):
+            pub.publish(i)
+        self.pro.update()
+        self.assertEqual([msg for msg, _ in sub.received], list(range(100)))
+        self.assertEqual(len(set(thread for _, thread in sub.received)), 1)
+
+    def test_partitions_shall_deliver_in_parallel_and_report_lag(self):
+        gate = threading.Event()
+        blocked = RecordingSubscriber('blocked', self.pro, gate)
+        blocked.subscribe(self.first)
+        other = RecordingSubscriber('other', self.pro)
+        other.subscribe(self.second)
+        for _ in range(3):
+            Publisher(self.first, self.pro).publish('msg')
+        Publisher(self.second, self.pro).publish('msg')
+        self.pro.partitions[self.pro.partition(self.second)].queue.join()
+        self.assertEqual(len(other.received), 1)
+        lag = [stats['lag'] for stats in self.pro.stats()]
+        self.assertEqual(lag[self.pro.partition(self.first)], 3)
+        self.assertEqual(lag[self.pro.partition(self.second)], 0)
+        gate.set()
+        self.pro.update()
+        self.assertEqual(len(blocked.received), 3)
+        self.assertEqual([stats['lag'] for stats in self.pro.stats()], [0, 0])
+
+    def test_partition_count_shall_be_changeable(self):
+        sub = RecordingSubscriber('sub', self.pro)
+        sub.subscribe(self.first)
+        Publisher(self.first, self.pro).publish('before')
+        self.pro.set_partitions(3)
+        self.assertEqual(len(self.pro.stats()), 3)
+        Publisher(self.first, self.pro).publish('after')
+        self.pro.update()
+        self.assertEqual([msg for msg, _ in sub.received], ['before', 'after'])
+
+    def test_partition_count_shall_be_at_least_one(self):
+        self.assertRaises(ValueError, self.pro.set_partitions, 0)
+        self.assertEqual(len(self.pro.stats()), 2)
+        self.assertRaises(ValueError, PartitionedProvider, 0)
+
+
+class Leaver(RecordingSubscriber):
+    def run(self, msg):
+        RecordingSubscriber.run(self, msg)
+        self.unsubscribe('fftv')
+
+
+class TestProvider(unittest.TestCase):
+    def test_subscriptions_changed_during_delivery_shall_apply_to_the_next_message(self):
+        pro = Provider()
+        leaver = Leaver('leaver', pro)
+        leaver.subscribe('fftv')
+        stayer = RecordingSubscriber('stayer', pro)
+        stayer.subscribe('fftv')
+        pub = Publisher('fftv', pro)
+        pub.publish('first')
+        pub.publish('second')
+        pro.update()
+        self.assertEqual([msg for msg, _ in leaver.received], ['first'])
+        self.assertEqual([msg for msg, _ in stayer.received], ['first', 'second'])
+        self.assertEqual(pro.subscribers['fftv'], (stayer,))
+
+
+class TestRecordQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = RecordQueue(Schema('Tick', [('price', 'd'), ('size', 'I')]), capacity=2)
+
+    def test_records_shall_come_back_in_order(self):
+        self.queue.append(('ticker', (1.5, 10)))
+        self.queue.append(('other', {'size': 20, 'price': 2.5}))
+        self.assertEqual(len(self.queue), 2)
+        pub_name, tick = self.queue.popleft()
+        self.assertEqual((pub_name, tick.price, tick.size), ('ticker', 1.5, 10))
+        self.assertEqual(self.queue.popleft(), ('other', (2.5, 20)))
+        self.assertRaises(IndexError, self.queue.popleft)
+
+    def test_arena_shall_grow_across_the_end_of_the_ring(self):
+        self.queue.append(('ticker', (0.0, 0)))
+        self.queue.popleft()
+        for i in range(5):
+            self.queue.append(('ticker', (float(i), i)))
+        self.assertEqual([tick.size for _, tick in self.queue.drain()], list(range(5)))
+        self.assertEqual(len(self.queue), 0)
+
+    def test_provider_shall_deliver_records(self):
+        pro = Provider(msg_queue=self.queue)
+        sub = RecordingSubscriber('sub', pro)
+        sub.subscribe('ticker')
+        Publisher('ticker', pro).publish((1.5, 10))
+        pro.update()
+        self.assertEqual([msg.size for msg, _ in sub.received], [10])
+        self.assertEqual(len(self.queue), 0)
+
+
+class TestConsumerGroup(unittest.TestCase):
+    def setUp(self):
+        self.pro = Provider()
+        self.members = [RecordingSubscriber('member {}'.format(i), self.pro) for i in range(3)]
+
+    def group(self, **kwargs):
+        group = ConsumerGroup('workers', self.pro, **kwargs)
+        self.addCleanup(group.close)
+        for member in self.members:
+            group.add(member)
+        group.subscribe('fftv')
+        return group
+
+    def test_round_robin_shall_share_the_messages_out_in_turn(self):
+        group = self.group()
+        pub = Publisher('fftv', self.pro)
+        for i in range(6):
+            pub.publish(i)
+        self.pro.update()
+        group.wait()
+        self.assertEqual([[msg for msg, _ in member.received] for member in self.members], [[0, 3], [1, 4], [2, 5]])
+        threads = set(thread for member in self.members for _, thread in member.received)
+        self.assertEqual(len(threads), 3)
+
+    def test_messages_of_a_key_shall_stay_in_order(self):
+        gate = threading.Event()
+        self.members[0].gate = gate
+        group = self.group(strategy=LEAST_LOADED, key=lambda msg: msg[0])
+        pub = Publisher('fftv', self.pro)
+        for i in range(20):
+            pub.publish(('a' if i % 2 else 'b', i))
+        self.pro.update()
+        gate.set()
+        group.wait()
+        received = [msg for member in self.members for msg, _ in member.received]
+        self.assertEqual(sorted(received), sorted(('a' if i % 2 else 'b', i) for i in range(20)))
+        for member in self.members:
+            for key in 'ab':
+                mine = [i for k, i in (msg for msg, _ in member.received) if k == key]
+                self.assertEqual(mine, sorted(mine))
+        self.assertEqual(sum(stats['delivered'] for stats in group.stats()), 20)
+
+    def test_removed_member_shall_get_no_more_messages(self):
+        group = self.group()
+        group.remove(self.members[0])
+        pub = Publisher('fftv', self.pro)
+        for i in range(4):
+            pub.publish(i)
+        self.pro.update()
+        group.wait()
+        self.assertEqual(self.members[0].received, [])
+        self.assertEqual(len(group.stats()), 2)
+
+    def test_removing_a_stranger_shall_raise_value_error(self):
+        group = self.group()
+        group.remove(self.members[0])
+        self.assertRaises(ValueError, group.remove, self.members[0])
+        self.assertEqual(len(group.stats()), 2)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+from patterns.behavioral.publish_subscribe_queues import (
+    BloomFilter,
+    ConflatingQueue,
+    DedupQueue,
+    Deduplicator,
+    PriorityQueue,
+    TimingWheel,
+)
+
+try:
+    from unittest.mock import patch, call
+except ImportError:
+    from mock import patch, call
+
+
+class TestPriorityQueue(unittest.TestCase):
+    def setUp(cls):
+        cls.now = 0.0
+        cls.queue = PriorityQueue(clock=lambda: cls.now)
+
+    def test_higher_priorities_shall_come_first_in_publishing_order(cls):
+        for msg, priority in (('a', 0), ('b', 1), ('c', 0), ('d', 1)):
+            cls.queue.append(msg, priority=priority)
+        cls.assertEqual([cls.queue.popleft() for _ in range(4)], ['b', 'd', 'a', 'c'])
+        cls.assertFalse(cls.queue)
+
+    def test_expired_messages_shall_be_dropped_and_counted(cls):
+        cls.queue.append('stale', priority=1, ttl=1)
+        cls.queue.append('fresh', ttl=10)
+        cls.queue.append('forever')
+        cls.now = 5.0
+        cls.assertEqual(len(cls.queue), 2)
+        cls.assertEqual(cls.queue.expired, 1)
+        cls.now = 20.0
+        cls.assertEqual(cls.queue.popleft(), 'forever')
+        cls.assertEqual(cls.queue.expired, 2)
+        cls.assertRaises(IndexError, cls.queue.popleft)
+
+    def test_provider_shall_deliver_by_priority_without_expired_messages(cls):
+        pro = Provider(msg_queue=cls.queue)
+        pub = Publisher(pro)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('#')
+        pub.publish('ads', ttl=1)
+        pub.publish('movie')
+        pub.publish('news', priority=2)
+        cls.now = 2.0
+        with patch.object(sub, 'run') as mock_subscriber_run:
+            pro.update()
+            cls.assertEqual(mock_subscriber_run.call_args_list, [call('news'), call('movie')])
+        cls.assertEqual(cls.queue.expired, 1)
+
+
+class TestConflatingQueue(unittest.TestCase):
+    def test_conflated_topics_shall_keep_the_latest_message_per_key(cls):
+        queue = ConflatingQueue(key=lambda msg: msg.split('.')[1])
+        queue.conflate('prices.#')
+        for msg in ('prices.eur.1', 'news', 'prices.usd.1', 'prices.eur.2', 'news', 'prices.eur.3'):
+            queue.append(msg)
+        cls.assertEqual(len(queue), 4)
+        cls.assertEqual(queue.conflated, 2)
+        cls.assertEqual([queue.popleft() for _ in range(4)], ['prices.eur.3', 'news', 'prices.usd.1', 'news'])
+        queue.append('prices.eur.4')
+        cls.assertEqual(queue.popleft(), 'prices.eur.4')
+
+    def test_provider_shall_deliver_one_message_per_key_and_update(cls):
+        queue = ConflatingQueue()
+        queue.conflate('ticks')
+        pro = Provider(msg_queue=queue)
+        pub = Publisher(pro)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('ticks')
+        sub.subscribe('trades')
+        for msg in ('ticks', 'trades', 'ticks', 'trades', 'ticks'):
+            pub.publish(msg)
+        with patch.object(sub, 'run') as mock_subscriber_run:
+            pro.update()
+            cls.assertEqual(mock_subscriber_run.call_args_list, [call('ticks'), call('trades'), call('trades')])
+
+    def test_conflation_cache_shall_stay_bounded(cls):
+        queue = ConflatingQueue(key=lambda msg: msg.split('.')[0])
+        queue.MATCH_CACHE_SIZE = 10
+        queue.conflate('prices.#')
+        for tick in range(100):
+            queue.append('prices.{}'.format(tick))
+            queue.append('news.{}'.format(tick))
+        cls.assertLessEqual(len(queue._conflates), 10)
+        cls.assertEqual(len(queue), 101)
+
+
+class FakeClock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimingWheel(unittest.TestCase):
+    def test_timers_shall_fire_at_their_tick_across_levels(cls):
+        clock = FakeClock()
+        wheel = TimingWheel(tick=1, clock=clock)
+        delays = [0, 1, 255, 256, 257, 65535, 65536, 70000]
+        for delay in delays:
+            wheel.schedule(delay, delay=delay)
+        cls.assertEqual(len(wheel), len(delays))
+        fired = {}
+        for second in range(70001):
+            clock.now = 1000 + second
+            for timer in wheel.expire():
+                fired[timer.msg] = second
+        cls.assertEqual(fired, dict((delay, delay) for delay in delays))
+        cls.assertEqual(len(wheel), 0)
+
+    def test_timers_shall_not_fire_before_their_delay(cls):
+        clock = FakeClock(0.0009)
+        wheel = TimingWheel(tick=0.001, clock=clock)
+        wheel.schedule('late', delay=0.002)
+        clock.now = 0.0020001
+        cls.assertEqual(wheel.expire(), [])
+        clock.now = 0.0031
+        cls.assertEqual([timer.msg for timer in wheel.expire()], ['late'])
+
+    def test_next_expiry_shall_never_be_later_than_a_timer(cls):
+        clock = FakeClock()
+        wheel = TimingWheel(tick=1, clock=clock)
+        cls.assertIsNone(wheel.next_expiry())
+        wheel.schedule('later', delay=300)
+        # when the level 1 slot of the timer is emptied into level 0
+        cls.assertEqual(wheel.next_expiry(), 280)
+        clock.now += 280
+        cls.assertEqual(wheel.expire(), [])
+        cls.assertEqual(wheel.next_expiry(), 20)
+        wheel.schedule('soon', delay=5)
+        cls.assertEqual(wheel.next_expiry(), 5)
+        wheel.schedule('now')
+        cls.assertEqual(wheel.next_expiry(), 0)
+
+    def test_periodic_timers_shall_repeat_until_cancelled(cls):
+        clock = FakeClock()
+        wheel = TimingWheel(tick=0.5, clock=clock)
+        timer = wheel.schedule('tick', delay=1, interval=1)
+        fired = []
+        for _ in range(6):
+            clock.now += 0.5
+            fired.append(len(wheel.expire()))
+        cls.assertEqual(fired, [0, 1, 0, 1, 0, 1])
+        timer.cancel()
+        clock.now += 2
+        cls.assertEqual(wheel.expire(), [])
+
+    def test_provider_shall_deliver_delayed_messages_once_due(cls):
+        clock = FakeClock()
+        pro = Provider(timers=TimingWheel(clock=clock))
+        pub = Publisher(pro)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('news')
+        pub.publish('news', delay=2)
+        with patch.object(sub, 'run') as mock_subscriber_run:
+            pro.update()
+            cls.assertEqual(mock_subscriber_run.call_count, 0)
+            clock.now += 2
+            pro.update()
+            mock_subscriber_run.assert_called_once_with('news')
+
+
+class TestDeduplicator(unittest.TestCase):
+    def test_ids_shall_be_forgotten_after_the_window(cls):
+        clock = FakeClock()
+        dedup = Deduplicator(window=10, clock=clock)
+        cls.assertFalse(dedup.seen('a'))
+        cls.assertTrue(dedup.seen('a'))
+        clock.now += 10
+        cls.assertFalse(dedup.seen('a'))
+        cls.assertEqual(dedup.stats()['duplicates'], 1)
+
+    def test_oldest_ids_shall_be_evicted_beyond_max_ids(cls):
+        dedup = Deduplicator(max_ids=2, clock=FakeClock())
+        for msg_id in ('a', 'b', 'c'):
+            dedup.seen(msg_id)
+        cls.assertFalse(dedup.seen('a'))
+        cls.assertTrue(dedup.seen('c'))
+        stats = dedup.stats()
+        cls.assertEqual((stats['evicted'], stats['remembered']), (2, 2))
+        cls.assertEqual(stats['eviction_rate'], 0.5)
+
+    def test_bloom_filter_shall_keep_the_result_exact(cls):
+        dedup = Deduplicator(max_ids=1000, bloom=True, clock=FakeClock())
+        cls.assertEqual([dedup.seen(i % 500) for i in range(1000)], [False] * 500 + [True] * 500)
+        cls.assertLess(dedup.stats()['false_positive_rate'], 0.05)
+
+    def test_bloom_filter_shall_contain_what_was_added(cls):
+        bloom = BloomFilter(100)
+        bloom.add('a')
+        cls.assertIn('a', bloom)
+        cls.assertLess(sum(str(i) in bloom for i in range(1000)), 50)
+
+    def test_provider_shall_deliver_a_message_id_once(cls):
+        pro = Provider(msg_queue=DedupQueue())
+        pub = Publisher(pro)
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('orders')
+        for msg_id in (1, 2, 1, None, None):
+            pub.publish('orders', msg_id=msg_id)
+        with patch.object(sub, 'run') as mock_subscriber_run:
+            pro.update()
+            cls.assertEqual(mock_subscriber_run.call_count, 4)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import unittest
+
+if sys.version_info >= (3, 8):
+    from patterns.behavioral.publish_subscribe_shm__py3 import RingFull, SharedRing
+
+
+@unittest.skipIf(sys.version_info < (3, 8), "requires python3.8 or higher")
+class TestSharedRing(unittest.TestCase):
+    def setUp(self):
+        self.ring = SharedRing(slots=2, slot_size=16, max_readers=2)
+        self.reader = SharedRing(**self.ring.attach())
+
+    def tearDown(self):
+        self.reader.close()
+        self.ring.close()
+        self.ring.unlink()
+
+    def test_readers_shall_see_the_payload_without_a_copy(self):
+        ref = self.ring.put(b'payload', readers=[0, 1])
+        view = self.reader.view(ref)
+        self.assertEqual(bytes(view), b'payload')
+        self.assertTrue(view.readonly)
+        self.ring.memory.buf[self.ring._data(ref.slot)] = ord('P')
+        self.assertEqual(bytes(view), b'Payload')
+        view.release()
+
+    def test_slots_shall_be_reused_once_every_reader_released_them(self):
+        first = self.ring.put(b'first', readers=[0, 1])
+        self.ring.put(b'second', readers=[])
+        self.assertEqual(self.ring.refcount(first.slot), 2)
+        self.reader.release(first, 0)
+        self.assertEqual(self.ring.refcount(first.slot), 1)
+        with self.assertRaises(RingFull):
+            self.ring.put(b'third', readers=[0], timeout=0.01)
+        self.reader.release(first, 1)
+        third = self.ring.put(b'third', readers=[0], timeout=0.01)
+        self.assertEqual(third.slot, first.slot)
+        with self.assertRaises(LookupError):
+            self.reader.view(first)
+
+    def test_oversized_payloads_shall_be_rejected(self):
+        with self.assertRaises(ValueError):
+            self.ring.put(b'x' * 17, readers=[0])
+
+
+@unittest.skipIf(sys.version_info < (3, 8), "requires python3.8 or higher")
+class TestOutput(unittest.TestCase):
+    def test_subscriber_process_shall_print_every_payload(self):
+        from patterns.behavioral.publish_subscribe_shm__py3 import OUTPUT
+
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.check_output(
+            [sys.executable, '-m', 'patterns.behavioral.publish_subscribe_shm__py3'], cwd=root, timeout=60
+        )
+        self.assertEqual(output.decode().strip(), OUTPUT.strip())
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+from patterns.behavioral.publish_subscribe_sinks import BinarySink, MemorySink, TextSink
+
+
+class TestSinks(unittest.TestCase):
+    def test_subscriber_shall_write_to_its_sink(self):
+        provider = Provider()
+        sink = MemorySink()
+        jim = Subscriber('jim', provider, sink=sink)
+        jim.subscribe('cartoon')
+        Publisher(provider).publish('cartoon')
+        provider.update()
+        self.assertEqual(sink.collected, [])
+        sink.flush()
+        self.assertEqual(sink.collected, ['jim got cartoon'])
+
+    def test_lines_shall_be_written_once_they_fill_the_buffer(self):
+        stream = io.StringIO()
+        sink = TextSink(stream, max_bytes=10)
+        for line in (u'abcd', u'efgh', u'ijkl'):
+            sink.write(line)
+        self.assertEqual(stream.getvalue(), u'abcd\nefgh\n')
+        sink.close()
+        self.assertEqual(stream.getvalue(), u'abcd\nefgh\nijkl\n')
+        self.assertEqual(sink.writes, 2)
+
+    def test_lines_shall_be_written_once_they_waited_long_enough(self):
+        sink = MemorySink(max_delay=0)
+        sink.write('now')
+        self.assertEqual(sink.collected, ['now'])
+
+    def test_binary_sink_shall_append_encoded_lines_to_a_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'deliveries.log')
+        with BinarySink(path) as sink:
+            sink.write(u'jim got caf\xe9')
+            sink.write(u'jim got movie')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), u'jim got caf\xe9\njim got movie\n'.encode('utf-8'))
+        self.assertTrue(sink.file.closed)
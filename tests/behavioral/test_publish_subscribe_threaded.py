@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+from patterns.behavioral.publish_subscribe import Publisher
+from patterns.behavioral.publish_subscribe_queues import PriorityQueue
+from patterns.behavioral.publish_subscribe_threaded import ThreadedProvider
+
+
+class RecordingSubscriber(object):
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.received = []
+
+    def run(self, msg):
+        if msg == self.fail_on:
+            raise ValueError(msg)
+        self.received.append(msg)
+
+
+class PickyQueue(object):
+    def __init__(self):
+        self.queue = []
+
+    def append(self, msg, **options):
+        if msg == 'bad':
+            raise ValueError(msg)
+        self.queue.append(msg)
+
+    def popleft(self):
+        return self.queue.pop(0)
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class TestThreadedProvider(unittest.TestCase):
+    def setUp(self):
+        self.provider = ThreadedProvider()
+
+    def tearDown(self):
+        self.provider.close()
+
+    def test_messages_of_all_producers_shall_be_delivered_in_their_order(self):
+        sub = RecordingSubscriber()
+        self.provider.subscribe('#', sub)
+
+        def produce(name):
+            pub = Publisher(self.provider)
+            for i in range(500):
+                pub.publish('{}.{}'.format(name, i))
+
+        producers = [threading.Thread(target=produce, args=('p{}'.format(n),)) for n in range(8)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        self.assertTrue(self.provider.update(timeout=5))
+        self.assertEqual(len(sub.received), 8 * 500)
+        for n in range(8):
+            mine = [msg for msg in sub.received if msg.startswith('p{}.'.format(n))]
+            self.assertEqual(mine, ['p{}.{}'.format(n, i) for i in range(500)])
+        stats = self.provider.stats()
+        self.assertEqual((stats['published'], stats['delivered']), (4000, 4000))
+
+    def test_dispatcher_shall_deliver_without_update(self):
+        delivered = threading.Event()
+        sub = RecordingSubscriber()
+        sub.run = lambda msg: delivered.set()
+        self.provider.subscribe('cartoon', sub)
+        Publisher(self.provider).publish('cartoon')
+        self.assertTrue(delivered.wait(5))
+
+    def test_failing_subscriber_shall_not_stop_the_dispatcher(self):
+        sub = RecordingSubscriber(fail_on='bad')
+        self.provider.subscribe('#', sub)
+        pub = Publisher(self.provider)
+        for msg in ('good', 'bad', 'after'):
+            pub.publish(msg)
+        self.assertTrue(self.provider.update(timeout=5))
+        self.assertEqual(sub.received, ['good', 'after'])
+        self.assertEqual(self.provider.stats()['errors'], 1)
+
+    def test_invalid_options_shall_raise_in_the_publisher(self):
+        pub = Publisher(self.provider)
+        self.assertRaises(TypeError, pub.publish, 'cartoon', priority=1)
+        sub = RecordingSubscriber()
+        self.provider.subscribe('cartoon', sub)
+        pub.publish('cartoon')
+        self.assertTrue(self.provider.update(timeout=5))
+        self.assertEqual(sub.received, ['cartoon'])
+
+    def test_options_of_the_msg_queue_shall_be_accepted(self):
+        provider = ThreadedProvider(msg_queue=PriorityQueue())
+        self.addCleanup(provider.close)
+        sub = RecordingSubscriber()
+        provider.subscribe('#', sub)
+        Publisher(provider).publish('urgent', priority=1)
+        self.assertTrue(provider.update(timeout=5))
+        self.assertEqual(sub.received, ['urgent'])
+
+    def test_delayed_messages_shall_be_delivered_by_the_dispatcher(self):
+        delivered = threading.Event()
+        sub = RecordingSubscriber()
+        sub.run = lambda msg: delivered.set()
+        self.provider.subscribe('cartoon', sub)
+        started = time.time()
+        Publisher(self.provider).publish('cartoon', delay=0.05)
+        self.assertTrue(delivered.wait(5))
+        self.assertGreaterEqual(time.time() - started, 0.05)
+        self.assertEqual(self.provider.stats()['errors'], 0)
+
+    def test_idle_dispatcher_shall_sleep_until_the_next_timer(self):
+        waits = []
+        wait = self.provider._wakeup.wait
+        self.provider._wakeup.wait = lambda timeout=None: waits.append(timeout) or wait(timeout)
+        Publisher(self.provider).publish('cartoon', delay=3600)
+        time.sleep(0.2)
+        self.assertLess(len(waits), 5)
+        self.assertTrue(all(timeout == self.provider.IDLE_TIMEOUT for timeout in waits))
+
+    def test_message_the_queue_rejects_shall_not_stop_the_dispatcher(self):
+        provider = ThreadedProvider(msg_queue=PickyQueue())
+        self.addCleanup(provider.close)
+        sub = RecordingSubscriber()
+        provider.subscribe('#', sub)
+        pub = Publisher(provider)
+        for msg in ('good', 'bad', 'after'):
+            pub.publish(msg)
+        self.assertTrue(provider.update(timeout=5))
+        self.assertEqual(sub.received, ['good', 'after'])
+        self.assertEqual(provider.stats()['errors'], 1)
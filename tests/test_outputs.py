@@ -10,6 +10,18 @@ import pytest
 
 from patterns.behavioral.publish_subscribe import main as publish_subscribe_main
 from patterns.behavioral.publish_subscribe import OUTPUT as publish_subscribe_output
+from patterns.behavioral.publish_subscribe_content import main as publish_subscribe_content_main
+from patterns.behavioral.publish_subscribe_content import OUTPUT as publish_subscribe_content_output
+from patterns.behavioral.publish_subscribe_log import main as publish_subscribe_log_main
+from patterns.behavioral.publish_subscribe_log import OUTPUT as publish_subscribe_log_output
+from patterns.behavioral.publish_subscribe_monitored import main as publish_subscribe_monitored_main
+from patterns.behavioral.publish_subscribe_monitored import OUTPUT as publish_subscribe_monitored_output
+from patterns.behavioral.publish_subscribe_queues import main as publish_subscribe_queues_main
+from patterns.behavioral.publish_subscribe_queues import OUTPUT as publish_subscribe_queues_output
+from patterns.behavioral.publish_subscribe_sinks import main as publish_subscribe_sinks_main
+from patterns.behavioral.publish_subscribe_sinks import OUTPUT as publish_subscribe_sinks_output
+from patterns.behavioral.publish_subscribe_threaded import main as publish_subscribe_threaded_main
+from patterns.behavioral.publish_subscribe_threaded import OUTPUT as publish_subscribe_threaded_output
 from patterns.behavioral.specification import main as specification_main
 from patterns.behavioral.specification import OUTPUT as specification_output
 from patterns.behavioral.state import main as state_main
@@ -20,6 +32,12 @@ from patterns.behavioral.state import OUTPUT as state_output
                     reason="requires python3.4 or higher")
 @pytest.mark.parametrize("main,output", [
     (publish_subscribe_main, publish_subscribe_output),
+    (publish_subscribe_content_main, publish_subscribe_content_output),
+    (publish_subscribe_log_main, publish_subscribe_log_output),
+    (publish_subscribe_monitored_main, publish_subscribe_monitored_output),
+    (publish_subscribe_queues_main, publish_subscribe_queues_output),
+    (publish_subscribe_sinks_main, publish_subscribe_sinks_output),
+    (publish_subscribe_threaded_main, publish_subscribe_threaded_output),
     (specification_main, specification_output),
     (state_main, state_output),
 ])